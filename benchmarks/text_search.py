@@ -0,0 +1,53 @@
+"""
+Compares Database.search on a full-text index with LIKE '%term%' scans.
+
+    $ python benchmarks/text_search.py --rows 1000000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from pysqlgui import Database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows in the table.')
+    parser.add_argument('--words', type=int, default=12, help='Number of words per row.')
+    parser.add_argument('--terms', type=int, default=20, help='Number of terms searched for.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    vocabulary = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 9))) for _ in range(50000)]
+    df = pd.DataFrame({'id': range(args.rows),
+                       'text': [' '.join(rng.choices(vocabulary, k=args.words)) for _ in range(args.rows)]})
+    terms = rng.sample(vocabulary, args.terms)
+
+    db = Database({'docs': df})
+    start = time.perf_counter()
+    db.create_text_index('docs', 'text')
+    build = time.perf_counter() - start
+
+    # LIKE returns every match, as ranking the matches needs all of them
+    start = time.perf_counter()
+    for term in terms:
+        db.select(f"SELECT * FROM docs WHERE text LIKE '%{term}%';")
+    like = (time.perf_counter() - start) / len(terms)
+
+    start = time.perf_counter()
+    for term in terms:
+        db.search('docs', term, limit=10)
+    search = (time.perf_counter() - start) / len(terms)
+
+    print(f'{args.rows:,} rows of {args.words} words, {len(terms)} terms')
+    print(f'index build:  {build:.2f}s')
+    print(f'LIKE scan:    {like * 1000:.1f} ms per query')
+    print(f'search:       {search * 1000:.1f} ms per query ({like / search:.0f}x faster)')
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
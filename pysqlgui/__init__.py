@@ -1 +1,2 @@
-from pysqlgui.core_database import Database
\ No newline at end of file
+from pysqlgui.core_database import Database
+from pysqlgui.core_server import Client, DatabaseServer
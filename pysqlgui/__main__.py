@@ -0,0 +1,52 @@
+import argparse
+import os
+
+from pysqlgui.core_database import Database
+from pysqlgui import core_server
+
+
+def main(argv=None):
+    """
+    Command line entry point.  Run `pysqlgui serve --help` for usage.
+    """
+    parser = argparse.ArgumentParser(prog='pysqlgui')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Serve a Database to local clients.')
+    serve.add_argument('--table', action='append', default=[], metavar='NAME=CSV',
+                       help='Load a CSV file as a table.  May be repeated.')
+    serve.add_argument('--database', default=None,
+                       help='Path to a SQLite database file.  Defaults to an in-memory database.')
+    serve.add_argument('--socket', default=None,
+                       help='Listen on this Unix socket instead of TCP.')
+    serve.add_argument('--host', default=core_server.DEFAULT_HOST)
+    serve.add_argument('--port', type=int, default=core_server.DEFAULT_PORT)
+    serve.add_argument('--workers', type=int, default=core_server.DEFAULT_WORKERS,
+                       help='Number of worker threads serving clients.')
+    serve.add_argument('--token', default=os.environ.get('PYSQLGUI_TOKEN'),
+                       help='Refuse requests without this token.  Defaults to $PYSQLGUI_TOKEN.')
+
+    args = parser.parse_args(argv)
+
+    tables = dict()
+    for table in args.table:
+        name, sep, path = table.partition('=')
+        if not sep:
+            parser.error(f'Expected NAME=CSV, got {table}.')
+        tables[name] = path
+
+    database = Database(tables, database=args.database)
+    address = args.socket if args.socket else (args.host, args.port)
+    server = core_server.DatabaseServer(database, address, workers=args.workers, token=args.token)
+    print(f'Serving {len(database.tables)} tables on {server.address}.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
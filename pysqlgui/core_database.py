@@ -1,10 +1,20 @@
+import json
+import os
 import sqlite3
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.request
 import pandas as pd
 from pysqlgui.core_table import Table
+from pysqlgui.core_sketch import ApproxCountDistinct, ApproxQuantile, TopValuesAggregate
+from pysqlgui import core_encoding, core_schema, core_follow, core_export, core_search
 
 class Database:
 
-    def __init__(self, data=None, table_names=None, name=None):
+    def __init__(self, data=None, table_names=None, name=None, database=None):
         """
         Parameters
         ----------
@@ -18,14 +28,134 @@ class Database:
 
         name : str, default=None, Optional
             Name given to the database.
+
+        database : str, default=None, Optional
+            Path to a SQLite database file.  Tables already stored in the file
+            are loaded.  If not provided, the database is kept in memory.
         """
-        self.connection = sqlite3.connect(":memory:")  # connection representing a database
+        self.path = database  # None for an in-memory database
+        self._temporary = None  # see _move_to_file
+
+        # connection representing a database, shared with background followers
+        self.connection = self._connect()
         self.cursor = self.connection.cursor()
+        self.connection.execute(core_schema.create_metadata_query())
+        if 'format' not in [row[1] for row in self.connection.execute(f'PRAGMA table_info({core_schema.METADATA_TABLE});')]:
+            # recorded by earlier versions without the format column
+            self.connection.execute(f'ALTER TABLE {core_schema.METADATA_TABLE} ADD COLUMN format TEXT;')
+        self.connection.execute(core_follow.create_checkpoint_query())
+        self.connection.commit()
+
+        self._lock = threading.RLock()
+        self._followers = []
+        self._ingest_locks = dict()  # path -> Lock, see _ingest
+        self._changes = self.connection.total_changes  # see _check_changes
 
         self.name = name
         self.tables = []
+        self._load_tables()
         self.add_table(data, table_names)
 
+    def _connect(self, read_only=False):
+        """
+        Opens a connection to the database, with the approximate aggregates
+        registered.
+
+        Parameters
+        ----------
+        read_only : bool, default=False, Optional
+            If True, opens the database file read-only.  Only for databases
+            stored in a file.
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+        if read_only:
+            uri = f'file:{urllib.request.pathname2url(os.path.abspath(self.path))}?mode=ro'
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        connection.create_aggregate('approx_count_distinct', 1, ApproxCountDistinct)
+        connection.create_aggregate('approx_quantile', 2, ApproxQuantile)
+        connection.create_aggregate('top_values', 2, TopValuesAggregate)
+        return connection
+
+    def _move_to_file(self):
+        """
+        Copies an in-memory database to a temporary file and switches to it,
+        so that other connections can read it, e.g. the worker connections
+        of a DatabaseServer.  The file uses write-ahead logging, so readers
+        and the writer do not block each other, and it is deleted by close().
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            if self.path not in (None, ':memory:'):
+                return
+            descriptor, path = tempfile.mkstemp(prefix='pysqlgui-', suffix='.db')
+            os.close(descriptor)
+            self.connection.commit()
+            self.path = self._temporary = path
+            connection = self._connect()
+            self.connection.backup(connection)
+            connection.execute('PRAGMA journal_mode=WAL;')
+            self.connection.close()
+            self.connection = connection
+            self.cursor = connection.cursor()
+            self._changes = connection.total_changes
+
+    def _load_tables(self):
+        """
+        Creates a Table object for every table already stored in the database.
+
+        Returns
+        -------
+        None
+        """
+        query = f'SELECT table_name, column_name, dtype, format FROM {core_schema.METADATA_TABLE} ORDER BY table_name, position;'
+        recorded = dict()
+        formats = dict()
+        for table_name, column, dtype, fmt in self.connection.execute(query).fetchall():
+            recorded.setdefault(table_name, dict())[column] = dtype
+            if fmt is not None:
+                formats.setdefault(table_name, dict())[column] = fmt
+
+        # Full-text indexes and the tables FTS5 stores them in
+        internal = set()
+        query = "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%';"
+        for (table_name,) in self.connection.execute(query).fetchall():
+            internal.add(table_name)
+            internal.update(core_search.shadow_table_names(table_name))
+
+        for table_name in [table_name for table_name in recorded if not self._exists(table_name)]:
+            # Dropped or renamed with run_query, the recorded dtypes are stale
+            self.connection.execute(f'DELETE FROM {core_schema.METADATA_TABLE} WHERE table_name = ?;', (table_name,))
+            self.connection.commit()
+            del recorded[table_name]
+            formats.pop(table_name, None)
+
+        for table_name, dtypes in recorded.items():
+            encoded_columns = [column for column, dtype in dtypes.items() if dtype == 'category'
+                               and self._exists(core_encoding.dictionary_table_name(table_name, column))]
+            internal.add(core_encoding.codes_table_name(table_name))
+            internal.update(core_encoding.dictionary_table_name(table_name, column) for column in encoded_columns)
+
+            table = Table(pd.DataFrame(), table_name, encoded_columns, dtypes, formats.get(table_name))
+            self.tables.append(table)
+            table.append(self.show(table_name))
+            table.text_index_columns = self._columns(core_search.fts_table_name(table_name))
+
+        query = ("SELECT name FROM sqlite_master WHERE type = 'table' "
+                 "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' AND name NOT LIKE '\\_pysqlgui\\_%' ESCAPE '\\';")
+        for (table_name,) in self.connection.execute(query).fetchall():
+            if table_name not in recorded and table_name not in internal:
+                table = Table(self.select(f'SELECT * FROM {core_encoding.quote(table_name)};'), table_name)
+                table.text_index_columns = self._columns(core_search.fts_table_name(table_name))
+                self.tables.append(table)
+
 
     def get_table(self, table_name):
         """
@@ -76,15 +206,15 @@ class Database:
         """
         table_info = []
 
-        for table in self.tables:
-            rows, cols = table.get_shape()
+        for table in list(self.tables):
+            rows, cols = self._current(table.name).get_shape()
             table_info.append([table.name, rows, cols])
 
         df = pd.DataFrame(table_info, columns=['Table Name', 'Rows', 'Columns'])
 
         return df
 
-    def info(self, table_name=None):
+    def info(self, table_name=None, stats=False, top=5):
         """
         Returns summary information about the database or a table.
 
@@ -94,6 +224,17 @@ class Database:
             The name of the table.  If a name is not provided, returns summary
             information about the database.
 
+        stats : bool, default=False, Optional
+            If True, adds the number of NULLs, an estimate of the number of
+            distinct values, the minimum, the maximum and the most frequent
+            values of every column, computed in a single scan of the table.
+            The table is also ANALYZEd so the SQLite query planner has
+            statistics on its indexes.  The result is cached until the data
+            in the database changes.
+
+        top : int, default=5, Optional
+            Number of most frequent values reported per column when stats is True.
+
         Returns
         -------
         Pandas DataFrame
@@ -113,12 +254,77 @@ class Database:
                                       'pk': 'Primary Key?'
                                      }, inplace=True)
 
-                df['Not NULL?'].replace(to_replace= {0: False, 1: True}, inplace=True)
-                df['Primary Key?'].replace(to_replace= {0: 'No', 1: 'Yes'}, inplace=True)
+                df['Not NULL?'] = df['Not NULL?'].replace(to_replace= {0: False, 1: True})
+                df['Primary Key?'] = df['Primary Key?'].replace(to_replace= {0: 'No', 1: 'Yes'})
+                if stats:
+                    df = df.merge(self._column_stats(table_name, list(df['Column Name']), top),
+                                  on='Column Name', how='left')
                 return df
             except:
                 raise ValueError(f'Could not get table information.')
 
+    def _column_stats(self, table_name, column_names, top=5):
+        """
+        Computes statistics for every column of a table in one scan, and
+        runs ANALYZE on the table.  Results are cached on the Table object,
+        keyed by the number of rows changed through the connection so far.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        column_names : list
+            The columns of the table.
+
+        top : int, default=5, Optional
+            Number of most frequent values reported per column.
+
+        Returns
+        -------
+        Pandas DataFrame
+            One row per column.
+        """
+        table = self.get_table(table_name)
+        key = (self.connection.total_changes, tuple(column_names), top)
+        if table.stats is not None and table.stats[0] == key:
+            return table.stats[1]
+
+        aggregates = []
+        for column in column_names:
+            quoted = core_encoding.quote(column)
+            # Python aggregates return NULL rather than 0 when there are no rows
+            aggregates += [f'SUM({quoted} IS NULL)', f'COALESCE(approx_count_distinct({quoted}), 0)',
+                           f'MIN({quoted})', f'MAX({quoted})', f'top_values({quoted}, {int(top)})']
+        query = f'SELECT {", ".join(aggregates)} FROM {core_encoding.quote(table_name)};'
+
+        analyzed = table_name
+        if table.encoded_columns:
+            analyzed = core_encoding.codes_table_name(table_name)
+
+        with self._lock:
+            row = self.connection.execute(query).fetchone()
+            self._check_changes()
+            self.connection.execute(f'ANALYZE {core_encoding.quote(analyzed)};')
+            self.connection.commit()
+            self._changes = self.connection.total_changes
+            key = (self.connection.total_changes, tuple(column_names), top)
+
+        width = len(aggregates) // max(len(column_names), 1)
+        records = []
+        for i, column in enumerate(column_names):
+            nulls, distinct, minimum, maximum, top_values = row[i * width:(i + 1) * width]
+            records.append({'Column Name': column,
+                            'NULLs': nulls or 0,
+                            'Distinct (approx.)': distinct,
+                            'Min': minimum,
+                            'Max': maximum,
+                            'Top Values': [tuple(pair) for pair in json.loads(top_values or '[]')]})
+        df = pd.DataFrame(records, columns=['Column Name', 'NULLs', 'Distinct (approx.)',
+                                            'Min', 'Max', 'Top Values'])
+        table.stats = (key, df)
+        return df
+
     def run_query(self, query: str):
         """
         Runs a SQL query.
@@ -139,8 +345,12 @@ class Database:
             return self.select(query)
         else:
             try:
-                self.cursor.executescript(query)
-                self.connection.commit()
+                with self._lock:
+                    self.cursor.executescript(query)
+                    self.connection.commit()
+                    if re.search(r'\bVACUUM\b', query, re.IGNORECASE):
+                        # VACUUM may renumber the rowids full-text indexes refer to
+                        self._rebuild_text_indexes()
                 print(f'Successfully ran query: {query}.') # Might want to slice this when displaying
 				#if query.lstrip().upper().startswith("CREATE"):
 				#	pass
@@ -152,6 +362,10 @@ class Database:
         """
         Returns a Pandas DataFrame representation of a query.
 
+        The recorded dtypes of a table are restored for the result columns
+        that are plain references to its columns, in a SELECT from that
+        single table.  Other columns are inferred by Pandas.
+
         Parameters
         ----------
         query : str
@@ -162,17 +376,118 @@ class Database:
         Pandas DataFrame
             Of the query.
         """
+        return self._select(query)
+
+    def _select(self, query, connection=None):
+        """
+        Runs select, reading with another connection to the same database
+        file if provided, instead of the shared connection.
+        """
         try:
-            self.cursor.execute(query)
-            result = self.cursor.fetchall() # result is list of tuples
-            column_names = list(map(lambda x: x[0], self.cursor.description))
-            df = pd.DataFrame(data=result, columns=column_names)
-            return df
+            if connection is None:
+                with self._lock:
+                    self.cursor.execute(query)
+                    result = self.cursor.fetchall() # result is list of tuples
+                    column_names = list(map(lambda x: x[0], self.cursor.description))
+            else:
+                cursor = connection.execute(query)
+                result = cursor.fetchall()
+                column_names = [description[0] for description in cursor.description]
+            table, sources = self._result_columns(query, column_names)
+            dtypes = dict()
+            if table is not None:
+                # SQLite column names are case insensitive
+                recorded = {column.lower(): dtype for column, dtype in table.dtypes.items()}
+                dtypes = {name: recorded[column.lower()] for name, column in sources.items()
+                          if column.lower() in recorded}
+            df = core_schema.build_frame(result, column_names, dtypes)
         except:
             raise ValueError(f'Could not execute given query: {query}') # might want to truncate this
+        return self._categorize(df, table, sources, connection)
+
+    def _result_columns(self, query, column_names):
+        """
+        Finds the table a query selects from, and the result columns copied
+        unchanged from its columns.
+
+        Returns
+        -------
+        Tuple(Table, dict)
+            The Table object, or None if the query is not a SELECT from a
+            single known table, and a dict mapping result column names to
+            the names of the table columns they come from.
+        """
+        origin = core_schema.result_columns(query)
+        if origin is None:
+            return None, dict()
+        table_name, columns = origin
+        table = next((table for table in self.tables if table.name.lower() == table_name.lower()), None)
+        if table is None:
+            return None, dict()
+
+        sources = dict()
+        for name, column in columns:
+            if column == '*':
+                sources.update({name: name for name in column_names})
+            else:
+                sources[name] = column
+        return table, sources
+
+    def _categorize(self, df, table, sources, connection=None):
+        """
+        Converts the columns of a query result that come from a dictionary
+        encoded column to Pandas Categorical columns with the categories of
+        its dictionary.  Columns are only converted when every value is
+        found in the dictionary.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            A query result.
+
+        table : Table
+            The table the result was selected from, or None.
+
+        sources : dict
+            Maps result column names to the table columns they come from.
+
+        connection : sqlite3.Connection, default=None, Optional
+            The connection to read the dictionaries with, instead of the
+            shared connection.
+
+        Returns
+        -------
+        Pandas DataFrame
+        """
+        if table is None or not table.encoded_columns or not df.columns.is_unique:
+            return df
+
+        encoded = {column.lower(): column for column in table.encoded_columns}
+        for name, column in sources.items():
+            if name not in df.columns or column.lower() not in encoded:
+                continue
+            if not (pd.api.types.is_object_dtype(df[name]) or pd.api.types.is_string_dtype(df[name])
+                    or isinstance(df[name].dtype, pd.CategoricalDtype)):
+                continue
+            categories = [value for _, value in self._dictionary(table.name, encoded[column.lower()], connection)]
+            categorical = pd.Categorical(df[name], categories=categories)
+            if categorical.isna().sum() == df[name].isna().sum():
+                df[name] = categorical
+        return df
+
+    def _dictionary(self, table_name, column_name, connection=None):
+        """
+        Returns the (code, value) pairs of a dictionary encoded column.
+        """
+        dictionary = core_encoding.quote(core_encoding.dictionary_table_name(table_name, column_name))
+        query = f'SELECT code, value FROM {dictionary} ORDER BY code;'
+        if connection is not None:
+            return connection.execute(query).fetchall()
+        with self._lock:
+            return self.connection.execute(query).fetchall()
 
     # allow strings?
-    def add_table(self, data, table_names=None):
+    def add_table(self, data, table_names=None, dictionary_encode=False, strict=False):
         """
         Adds one or more Table objects to the current Database instance.
 
@@ -186,6 +501,15 @@ class Database:
         table_names : list, default=None, Optional
             List of names of the tables, must be provided if data is of type list.
 
+        dictionary_encode : bool or list, default=False, Optional
+            If True, low-cardinality text columns of new tables are stored as
+            integer codes plus a dictionary table, behind a view with the
+            table's name.  A list of column names encodes those columns instead.
+            Encoded columns are returned as Pandas Categorical columns.
+
+        strict : bool, default=False, Optional
+            If True, new tables are created as SQLite STRICT tables.
+
         Returns
         -------
         None
@@ -226,8 +550,243 @@ class Database:
                 # assume CSV, fix for other types?
                 table = pd.read_csv(table)
 
-            table.to_sql(name, con=self.connection, if_exists='append', index=False)
-            self.tables.append(Table(table, name))
+            with self._lock:
+                try:
+                    self._check_changes()
+                    self._write_table(name, table, dictionary_encode, strict)
+                    self.connection.commit()
+                    self._changes = self.connection.total_changes
+                except ValueError:
+                    self.connection.rollback()
+                    raise
+                except:
+                    self.connection.rollback()
+                    raise ValueError(f'Could not add table: {name}.')
+
+    def _write_table(self, name, df, dictionary_encode=False, strict=False):
+        """
+        Creates a table from a DataFrame, or appends the DataFrame to the
+        table if it already exists, and updates the matching Table object.
+        Does not commit.
+
+        Parameters
+        ----------
+        name : str
+            The name of the table.
+
+        df : Pandas DataFrame
+            The data.
+
+        dictionary_encode : bool or list, default=False, Optional
+            See add_table.
+
+        strict : bool, default=False, Optional
+            See add_table.
+
+        Returns
+        -------
+        None
+        """
+        if self._exists(name):
+            table = None
+            for existing in self.tables:
+                if existing.name == name:
+                    table = existing
+                    df = table.conform(df)
+                    self._widen_formats(table, df)
+            self._insert_frame(name, df, table.formats if table is not None else None)
+            if table is None:
+                self.tables.append(Table(df, name))
+            else:
+                table.append(df)
+            return
+
+        # Infer compact column types, e.g. whole-number floats become
+        # nullable integers and ISO 8601 text becomes datetime64
+        df, schema = core_schema.infer_schema(df, strict)
+
+        encoded_columns = []
+        if dictionary_encode:
+            if dictionary_encode is True:
+                encoded_columns = core_encoding.detect_low_cardinality(df)
+            else:
+                encoded_columns = list(dictionary_encode)
+                for column in encoded_columns:
+                    if column not in df.columns:
+                        raise ValueError(f'{column} column does not exist in {name}.')
+
+        schema = [(column, 'category' if column in encoded_columns else dtype, column_type)
+                  for column, dtype, column_type in schema]
+        # Each datetime column has one text format, widened by later rows
+        # if needed, so equal datetimes are always stored as equal text
+        formats = core_schema.datetime_formats(df)
+        if encoded_columns:
+            self._add_encoded_table(name, df, encoded_columns, schema, strict, formats)
+        else:
+            self.connection.execute(core_schema.create_table_query(name, schema, strict))
+            self._insert_frame(name, df, formats)
+        self.connection.executemany(f'INSERT INTO {core_schema.METADATA_TABLE} VALUES (?, ?, ?, ?, ?, ?);',
+                                    [(name, column, position, dtype, column_type, formats.get(column))
+                                     for position, (column, dtype, column_type) in enumerate(schema)])
+        self.tables.append(Table(df, name, encoded_columns,
+                                 {column: dtype for column, dtype, _ in schema}, formats))
+
+    def _insert_frame(self, name, df, formats=None):
+        """
+        Inserts the rows of a DataFrame into a table, without committing.
+
+        Parameters
+        ----------
+        name : str
+            The name of the table.
+
+        df : Pandas DataFrame
+            The rows to insert.
+
+        formats : dict, default=None, Optional
+            The recorded text format of datetime columns.
+
+        Returns
+        -------
+        None
+        """
+        columns = ', '.join(core_encoding.quote(column) for column in df.columns)
+        placeholders = ', '.join('?' * len(df.columns))
+        self.connection.executemany(f'INSERT INTO {core_encoding.quote(name)}({columns}) VALUES ({placeholders});',
+                                    core_schema.to_rows(df, formats))
+
+    def _widen_formats(self, table, df):
+        """
+        Widens the recorded text format of the datetime columns of a table
+        whose new values need a longer format, e.g. values with a time added
+        to a column of dates, and rewrites the stored values in that format.
+        Does not commit.
+
+        Parameters
+        ----------
+        table : Table
+            The table the rows are added to.
+
+        df : Pandas DataFrame
+            The rows to add.
+
+        Returns
+        -------
+        None
+        """
+        source = core_encoding.codes_table_name(table.name) if table.encoded_columns else table.name
+        for column, fmt in core_schema.datetime_formats(df).items():
+            current = table.formats.get(column)
+            if current not in core_schema.DATETIME_FORMATS or (core_schema.DATETIME_FORMATS.index(fmt)
+                                                               <= core_schema.DATETIME_FORMATS.index(current)):
+                continue
+            self.connection.execute(core_schema.widen_format_query(source, column, current, fmt))
+            self.connection.execute(f'UPDATE {core_schema.METADATA_TABLE} SET format = ? '
+                                    f'WHERE table_name = ? AND column_name = ?;', (fmt, table.name, column))
+            table.formats[column] = fmt
+
+    def _rebuild_text_indexes(self):
+        """
+        Refills every full-text index from the rows of its table, and commits.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            for table in self.tables:
+                if table.text_index_columns:
+                    for statement in core_search.rebuild_index_query(table.name, table.text_index_columns,
+                                                                     table.encoded_columns):
+                        self.connection.execute(statement)
+            self.connection.commit()
+
+    def _check_changes(self):
+        """
+        Marks every Table object stale if rows were changed through the
+        connection since the last change made by add_table, insert_data or
+        follow, e.g. by a DELETE or UPDATE run with run_query.  SQLite does
+        not tell which table was changed.
+        """
+        if self.connection.total_changes != self._changes:
+            for table in self.tables:
+                table.stale = True
+            self._changes = self.connection.total_changes
+
+    def _current(self, table_name):
+        """
+        Returns a Table object, first rebuilding its DataFrame representation
+        and sketches from the database if they are stale.
+        """
+        table = self.get_table(table_name)
+        with self._lock:
+            self._check_changes()
+            if table.stale:
+                table.reset(self.show(table_name))
+                table.stale = False
+        return table
+
+    def _exists(self, name):
+        """
+        Returns True if a table or view of that name exists in the database.
+        """
+        query = "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?;"
+        return self.connection.execute(query, (name,)).fetchone() is not None
+
+    def _columns(self, name):
+        """
+        Returns the column names of a table or view, or an empty list if it does not exist.
+        """
+        with self._lock:
+            return [row[1] for row in self.connection.execute(f'PRAGMA table_info({core_encoding.quote(name)});')]
+
+    def _add_encoded_table(self, name, df, encoded_columns, schema, strict=False, formats=None):
+        """
+        Stores a DataFrame as a table of integer codes plus one dictionary
+        table per encoded column, and creates a view named after the table
+        that decodes it.  Rows inserted into the view are encoded by a trigger.
+        The table of codes is indexed for the triggers and for equality
+        filters on encoded columns, see core_encoding.create_index_query.
+
+        Parameters
+        ----------
+        name : str
+            The name of the table.
+
+        df : Pandas DataFrame
+            The data.
+
+        encoded_columns : list
+            The columns to encode.
+
+        schema : list
+            Tuples of (column name, dtype, SQL type) of the table.
+
+        strict : bool, default=False, Optional
+            If True, the table of codes is created as a SQLite STRICT table.
+
+        formats : dict, default=None, Optional
+            The text format of datetime columns.
+
+        Returns
+        -------
+        None
+        """
+        codes, dictionaries = core_encoding.encode(df, encoded_columns)
+        codes_schema = [(column, dtype, 'INTEGER' if column in encoded_columns else column_type)
+                        for column, dtype, column_type in schema]
+
+        for column, values in dictionaries.items():
+            dictionary = core_encoding.quote(core_encoding.dictionary_table_name(name, column))
+            self.connection.execute(core_encoding.create_dictionary_query(name, column))
+            self.connection.executemany(f'INSERT INTO {dictionary}(code, value) VALUES (?, ?);',
+                                        enumerate(values, 1))
+        codes_name = core_encoding.codes_table_name(name)
+        self.connection.execute(core_schema.create_table_query(codes_name, codes_schema, strict))
+        self._insert_frame(codes_name, codes, formats)
+        for statement in (core_encoding.create_index_query(name, list(df.columns), encoded_columns)
+                          + core_encoding.create_view_query(name, list(df.columns), encoded_columns)):
+            self.connection.execute(statement)
 
     def rename_table(self, table_name, change_to):
         """
@@ -255,9 +814,23 @@ class Database:
 
         try:
             table = self.get_table(table_name)
-            query = f'ALTER TABLE {table_name} RENAME TO {change_to};'
-            self.run_query(query)
+            query = ''
+            if table.text_index_columns:
+                # The index refers to the table by name, it is rebuilt under the new name
+                query = core_search.drop_index_query(table_name) + '\n'
+            if table.encoded_columns:
+                query += core_encoding.rename_query(table_name, change_to, list(table.df.columns), table.encoded_columns)
+            else:
+                query += f'ALTER TABLE {table_name} RENAME TO {change_to};'
+            query += (f'\nUPDATE {core_schema.METADATA_TABLE} SET table_name = {stringify(change_to)} '
+                      f'WHERE table_name = {stringify(table_name)};')
+            with self._lock:
+                self._check_changes()
+                self.run_query(query)
+                self._changes = self.connection.total_changes
             table.name = change_to
+            if table.text_index_columns:
+                self.create_text_index(change_to, table.text_index_columns)
             print(f'Successfully renamed {table_name} to {change_to}.')
         except:
             raise ValueError('Could not rename table.')
@@ -277,8 +850,18 @@ class Database:
         """
         try:
             table = self.get_table(table_name)
-            query = f'DROP TABLE {table_name};'
-            self.run_query(query)
+            query = ''
+            if table.text_index_columns:
+                query = core_search.drop_index_query(table_name) + '\n'
+            if table.encoded_columns:
+                query += core_encoding.drop_query(table_name, table.encoded_columns)
+            else:
+                query += f'DROP TABLE {table_name};'
+            query += f'\nDELETE FROM {core_schema.METADATA_TABLE} WHERE table_name = {stringify(table_name)};'
+            with self._lock:
+                self._check_changes()
+                self.run_query(query)
+                self._changes = self.connection.total_changes
             self.remove(table)
             print(f'Successfully dropped {table_name}.')
         except:
@@ -341,38 +924,25 @@ class Database:
         None
         """
 
-        # CLEAN THIS UP! and allow for more rows to be added
         if isinstance(data, dict):
-            try:
-                table = self.get_table(table_name)
-
-                col_names, col_values = row_rep_query(data)
-
-                query = f"INSERT INTO {table_name}({col_names}) VALUES ({col_values});"
-                self.run_query(query)
+            data = pd.DataFrame.from_records([data])
+        elif not isinstance(data, pd.DataFrame):
+            raise TypeError(f'Expected data to be dict or Pandas.Dataframe, got {type(data)}.')
 
-                table.df = table.df.append(pd.DataFrame.from_records([data]), ignore_index = True)
-#                 print(f'Successfully INSERTED values into {table_name}.')
-            except:
-                raise ValueError('Could not INSERT values into table.')
-        elif isinstance(data, pd.DataFrame):
+        with self._lock:
             try:
                 table = self.get_table(table_name)
-
-                records = data.to_dict(orient='records')
-                query = ""
-                for row in records:
-                    col_names, col_values = row_rep_query(row)
-                    row_query = f"INSERT INTO {table_name}({col_names}) VALUES ({col_values});"
-                    query += row_query
-
-                self.run_query(query)
-                table.df = table.df.append(data, ignore_index = True)
+                data = table.conform(data)
+                self._check_changes()
+                self._widen_formats(table, data)
+                self._insert_frame(table_name, data, table.formats)
+                self.connection.commit()
+                self._changes = self.connection.total_changes
+                table.append(data)
 #                 print(f'Successfully INSERTED values into {table_name}.')
             except:
+                self.connection.rollback()
                 raise ValueError('Could not INSERT values into table.')
-        else:
-            raise TypeError(f'Expected data to be dict or Pandas.Dataframe, got {type(data)}.')
 
     # TO DO - Show within a certain range only?
     def show(self, table_name):
@@ -388,8 +958,371 @@ class Database:
         -------
             Pandas DataFrame of the table contents.
         """
+        for table in self.tables:
+            if table.name == table_name and table.encoded_columns:
+                # Read the codes directly instead of joining with the dictionaries
+                codes = core_encoding.quote(core_encoding.codes_table_name(table_name))
+                dtypes = {column: dtype for column, dtype in table.dtypes.items()
+                          if column not in table.encoded_columns}
+                with self._lock:
+                    cursor = self.connection.execute(f'SELECT * FROM {codes};')
+                    column_names = [description[0] for description in cursor.description]
+                    df = core_schema.build_frame(cursor.fetchall(), column_names, dtypes)
+                    for column in table.encoded_columns:
+                        df[column] = core_encoding.decode(df[column], self._dictionary(table_name, column))
+                return df
+            if table.name == table_name and table.dtypes:
+                # Restore this table's own dtypes rather than matching by column name
+                try:
+                    with self._lock:
+                        cursor = self.connection.execute(f'SELECT * FROM {core_encoding.quote(table_name)};')
+                        column_names = [description[0] for description in cursor.description]
+                        rows = cursor.fetchall()
+                    return core_schema.build_frame(rows, column_names, table.dtypes)
+                except:
+                    raise ValueError(f'Could not show table: {table_name}')
         return self.select(f'SELECT * FROM {table_name};')
 
+    def sample(self, table_name, fraction=None, n=None, seed=None):
+        """
+        Returns a uniform random sample of the rows of a table.  The sample is
+        drawn from a reservoir maintained as rows are added, so no table scan
+        is needed.  Samples larger than the reservoir are drawn from the full
+        table instead.
+
+        The reservoir is kept in memory.  It is rebuilt with a scan of the
+        table when the table is loaded from a database file, and after rows
+        are changed other than by add_table, insert_data or follow.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        fraction : float, default=None, Optional
+            Fraction of the rows to return.  Exactly one of fraction or n
+            must be provided.
+
+        n : int, default=None, Optional
+            Number of rows to return.
+
+        seed : int, default=None, Optional
+            Seed for the random selection.
+
+        Returns
+        -------
+        Pandas DataFrame
+            The sampled rows.
+        """
+        table = self._current(table_name)
+        rows = table.reservoir.seen
+
+        if (fraction is None) == (n is None):
+            raise ValueError('Expected exactly one of fraction or n.')
+        if fraction is not None:
+            if not 0 <= fraction <= 1:
+                raise ValueError(f'Expected 0 <= fraction <= 1, got {fraction}.')
+            n = int(round(fraction * rows))
+        if not isinstance(n, int) or n < 0:
+            raise ValueError(f'Expected n to be a non-negative int, got {n}.')
+
+        n = min(n, rows)
+        if n <= len(table.reservoir.rows):
+            records = random.Random(seed).sample(table.reservoir.rows, n)
+            df = table.conform(pd.DataFrame.from_records(records, columns=table.df.columns))
+            for column in table.encoded_columns:
+                df[column] = pd.Categorical(df[column], categories=table.df[column].cat.categories)
+            return df
+        return table.df.sample(n=n, random_state=seed).reset_index(drop=True)
+
+    def approx_distinct(self, table_name, column_name):
+        """
+        Returns the approximate number of distinct non-NULL values in a column,
+        read from a HyperLogLog sketch maintained as rows are added.  Like the
+        reservoir of sample, the sketch is kept in memory and rebuilt with a
+        scan of the table when it is loaded or changed by other means.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        column_name : str
+            The name of the column.
+
+        Returns
+        -------
+        Tuple(int, int)
+            The estimate and its standard error.
+        """
+        table = self._current(table_name)
+        try:
+            sketch = table.distinct_sketches[column_name]
+        except KeyError:
+            raise ValueError(f'{column_name} column does not exist in {table_name}.')
+        return (int(round(sketch.estimate())), int(round(sketch.error())))
+
+    def approx_quantile(self, table_name, column_name, q):
+        """
+        Returns an approximate quantile of a numeric column, read from a
+        t-digest sketch maintained as rows are added.  See approx_distinct.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        column_name : str
+            The name of the numeric column.
+
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        Tuple(float, float)
+            The estimate and a bound on its absolute error.
+        """
+        table = self._current(table_name)
+        try:
+            sketch = table.quantile_sketches[column_name]
+        except KeyError:
+            raise ValueError(f'{column_name} is not a numeric column of {table_name}.')
+        return sketch.quantile(q)
+
+    def create_text_index(self, table_name, columns):
+        """
+        Creates a full-text index (SQLite FTS5) on text columns of a table,
+        replacing any existing index of the table.  The index is kept in sync
+        by triggers, so rows added with insert_data, add_table or follow, and
+        rows deleted or updated with run_query, are reflected in search results.
+
+        The index refers to rows by rowid, which VACUUM may change, so it is
+        rebuilt after a VACUUM run with run_query.  After a VACUUM run by
+        another program, call create_text_index again.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        columns : str or list
+            The name(s) of the columns to index.
+
+        Returns
+        -------
+        None
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        table = self.get_table(table_name)
+        table_columns = self._columns(table_name)
+        if len(columns) == 0:
+            raise ValueError('Expected at least one column to index.')
+        for column in columns:
+            if column not in table_columns:
+                raise ValueError(f'{column} column does not exist in {table_name}.')
+
+        with self._lock:
+            try:
+                self.connection.commit()
+                self.connection.execute('BEGIN;')
+                statements = core_search.drop_index_query(table_name).split('\n')
+                statements += core_search.create_index_query(table_name, list(columns), table.encoded_columns)
+                self._check_changes()
+                for statement in statements:
+                    self.connection.execute(statement)
+                self.connection.commit()
+                self._changes = self.connection.total_changes
+            except:
+                self.connection.rollback()
+                raise ValueError(f'Could not create text index on {table_name}.')
+        table.text_index_columns = list(columns)
+        print(f'Successfully created text index on {table_name}({", ".join(columns)}).')
+
+    def search(self, table_name, query, limit=10):
+        """
+        Returns the rows of a table matching a full-text query, best matches
+        first.  Requires a text index, see create_text_index.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        query : str
+            An FTS5 query, e.g. 'sqlite', 'sqlite AND python', '"exact phrase"',
+            'pre*', or 'column: term' to search a single indexed column.
+
+        limit : int, default=10, Optional
+            Maximum number of rows returned.
+
+        Returns
+        -------
+        Pandas DataFrame
+            The matching rows, ordered by relevance (BM25).
+        """
+        table = self.get_table(table_name)
+        if not table.text_index_columns:
+            raise ValueError(f'{table_name} has no text index, see create_text_index.')
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError(f'Expected limit to be a positive int, got {limit}.')
+
+        sql = core_search.search_query(table_name, self._columns(table_name), table.encoded_columns, limit)
+        try:
+            with self._lock:
+                cursor = self.connection.execute(sql, (query,))
+                column_names = [description[0] for description in cursor.description]
+                rows = cursor.fetchall()
+        except:
+            raise ValueError(f'Could not search {table_name} for: {query}')
+        return self._categorize(core_schema.build_frame(rows, column_names, table.dtypes),
+                                table, {column: column for column in column_names})
+
+
+    def follow(self, path, table_name, batch_size=core_follow.DEFAULT_BATCH_SIZE, interval=None):
+        """
+        Ingests the rows appended to a CSV file since it was last followed.
+        The byte offset reached in each file is stored in the database with
+        every batch, so ingestion resumes where it stopped, including after
+        a restart when the database is stored in a file.  The table is
+        created from the first batch if it does not exist.
+
+        Parameters
+        ----------
+        path : str
+            Path to the CSV file.  The first line must be the header, and
+            each record must be on a single line.
+
+        table_name : str
+            The name of the table to ingest into.
+
+        batch_size : int, default=10000, Optional
+            Maximum number of rows inserted per transaction.
+
+        interval : float, default=None, Optional
+            If provided, the file is polled every interval seconds on a
+            background thread until stop() is called on the returned object,
+            or the database is closed.
+
+        Returns
+        -------
+        int or Follower
+            The number of rows ingested, or the Follower polling the file
+            if an interval is provided.
+        """
+        if not isinstance(table_name, str) or len(table_name) == 0:
+            raise ValueError(f'Expected table_name to be a non-empty str, got {table_name}.')
+        if not os.path.isfile(path):
+            raise ValueError(f'Could not find file: {path}.')
+
+        if interval is None:
+            return self._ingest(path, table_name, batch_size)
+        follower = core_follow.Follower(self, path, table_name, batch_size, interval)
+        self._followers.append(follower)
+        return follower
+
+    def _ingest(self, path, table_name, batch_size=core_follow.DEFAULT_BATCH_SIZE):
+        """
+        Ingests the new rows of a followed file, committing each batch
+        together with the file's checkpoint.  Ingests of the same file run
+        one at a time, each starting from the checkpoint left by the
+        previous one, so rows are never ingested twice.
+
+        Returns
+        -------
+        int
+            The number of rows ingested.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            path_lock = self._ingest_locks.setdefault(path, threading.Lock())
+
+        with path_lock:
+            query = f'SELECT offset, rows, header FROM {core_follow.CHECKPOINT_TABLE} WHERE path = ?;'
+            with self._lock:
+                checkpoint = self.connection.execute(query, (path,)).fetchone()
+            offset, rows, header = checkpoint if checkpoint else (0, 0, None)
+
+            ingested = 0
+            for df, offset, new_header in core_follow.read_batches(path, offset, header, batch_size):
+                header = new_header
+                with self._lock:
+                    try:
+                        self._check_changes()
+                        self._write_table(table_name, df)
+                        rows += len(df)
+                        self.connection.execute(core_follow.save_checkpoint_query(),
+                                                (path, table_name, offset, rows, header))
+                        self.connection.commit()
+                        self._changes = self.connection.total_changes
+                    except:
+                        self.connection.rollback()
+                        raise ValueError(f'Could not ingest {path} into {table_name}.')
+                ingested += len(df)
+        return ingested
+
+    def export(self, query_or_table, path, format='csv', compression='infer',
+               batch_size=core_export.DEFAULT_BATCH_SIZE):
+        """
+        Writes a table or the result of a query to a file.  Rows are streamed
+        from the cursor in batches, so memory use does not grow with the size
+        of the result.
+
+        Parameters
+        ----------
+        query_or_table : str
+            The name of a table, or a SQL query returning rows.  Changes made
+            by the query are rolled back.
+
+        path : str
+            Path to the output file.
+
+        format : str, default='csv', Optional
+            Either 'csv' (with a header line) or 'jsonl' (one JSON object per row).
+
+        compression : str, default='infer', Optional
+            One of 'gzip', 'bz2', 'xz' or None.  If 'infer', the compression is
+            chosen from the file extension (.gz, .bz2 or .xz).
+
+        batch_size : int, default=10000, Optional
+            Number of rows fetched from the cursor at a time.
+
+        Returns
+        -------
+        int
+            The number of rows written.
+        """
+        if format not in core_export.WRITERS:
+            raise ValueError(f'Expected format to be one of {list(core_export.WRITERS)}, got {format}.')
+
+        start = time.perf_counter()
+        with self._lock:
+            # table names are case-insensitive in SQLite
+            table = self.connection.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                                            "AND name = ? COLLATE NOCASE;", (query_or_table,)).fetchone()
+            query = f'SELECT * FROM {core_encoding.quote(table[0])};' if table else query_or_table
+
+            # The query runs in a transaction that is always rolled back, so
+            # a statement that is not a SELECT cannot change the database
+            self.connection.commit()
+            self.connection.execute('BEGIN;')
+            try:
+                try:
+                    cursor = self.connection.execute(query)
+                except:
+                    raise ValueError(f'Could not execute given query: {query}')
+                if cursor.description is None:
+                    raise ValueError(f'Expected a table name or a query returning rows, got: {query}')
+                with core_export.open_output(path, compression) as f:
+                    rows = core_export.WRITERS[format](cursor, f, batch_size)
+            finally:
+                self.connection.rollback()
+        seconds = time.perf_counter() - start
+
+        print(f'Successfully exported {rows} rows to {path} in {seconds:.2f}s '
+              f'({rows / max(seconds, 1e-9):,.0f} rows/s).')
+        return rows
 
     def close(self):
         """
@@ -399,10 +1332,17 @@ class Database:
         -------
         None
         """
+        for follower in self._followers:
+            follower.stop()
+        self._followers = []
         try:
             self.connection.close()
         except:
             print('Could not close the connection.')
+        if self._temporary is not None:
+            for path in (self._temporary, self._temporary + '-wal', self._temporary + '-shm'):
+                if os.path.exists(path):
+                    os.remove(path)
 
 
 
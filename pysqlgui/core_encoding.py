@@ -0,0 +1,291 @@
+import pandas as pd
+
+DICTIONARY_ENCODE_MAX_RATIO = 0.5
+
+
+def detect_low_cardinality(df, max_ratio=DICTIONARY_ENCODE_MAX_RATIO):
+    """
+    Returns the text columns of a DataFrame worth dictionary encoding.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The data to inspect.
+
+    max_ratio : float, default=DICTIONARY_ENCODE_MAX_RATIO, Optional
+        A column qualifies if its number of distinct values is at most
+        this fraction of its number of non-NULL values.
+
+    Returns
+    -------
+    list
+        The names of the qualifying columns.
+    """
+    columns = []
+    for column in df.columns:
+        values = df[column].dropna()
+        if values.empty or not (pd.api.types.is_object_dtype(values)
+                                or pd.api.types.is_string_dtype(values)
+                                or isinstance(values.dtype, pd.CategoricalDtype)):
+            continue
+        if not all(isinstance(v, str) for v in values.unique()):
+            continue
+        if values.nunique() <= max_ratio * len(values):
+            columns.append(column)
+    return columns
+
+
+def codes_table_name(table_name):
+    """
+    Returns the name of the table holding the rows of an encoded table.
+    """
+    return f'{table_name}__codes'
+
+
+def dictionary_table_name(table_name, column_name):
+    """
+    Returns the name of the dictionary table of an encoded column.
+    """
+    return f'{table_name}__{column_name}__dict'
+
+
+def quote(identifier):
+    """
+    Returns a quoted SQL identifier.
+
+    Parameters
+    ----------
+    identifier : str
+        A table or column name.
+
+    Returns
+    -------
+    str
+    """
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def create_dictionary_query(table_name, column_name):
+    """
+    Returns the CREATE statement for the dictionary table of an encoded column.
+    """
+    return (f'CREATE TABLE {quote(dictionary_table_name(table_name, column_name))}'
+            f'(code INTEGER PRIMARY KEY, value TEXT UNIQUE);')
+
+
+def decoded_select(table_name, columns, encoded_columns):
+    """
+    Returns the column list and the joins of a SELECT decoding the rows of
+    an encoded table, whose table of codes must be aliased as c.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    columns : list
+        All column names, in order.
+
+    encoded_columns : list
+        The dictionary encoded column names.
+
+    Returns
+    -------
+    Tuple(str, str)
+    """
+    select_cols = []
+    joins = []
+    for i, column in enumerate(columns):
+        if column in encoded_columns:
+            alias = f'd{i}'
+            select_cols.append(f'{alias}.value AS {quote(column)}')
+            joins.append(f'LEFT JOIN {quote(dictionary_table_name(table_name, column))} {alias} '
+                         f'ON {alias}.code = c.{quote(column)}')
+        else:
+            select_cols.append(f'c.{quote(column)} AS {quote(column)}')
+    return ', '.join(select_cols), ' '.join(joins)
+
+
+def create_view_query(table_name, columns, encoded_columns):
+    """
+    Returns the statements creating the view that decodes an encoded table,
+    and the triggers that apply INSERT, DELETE and UPDATE statements on the
+    view to the table of codes.
+
+    A view has no rowid, so a row deleted or updated through the view is
+    looked up in the table of codes by the values of all its columns, which
+    is a search of the index created by create_index_query.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table, which becomes the name of the view.
+
+    columns : list
+        All column names, in order.
+
+    encoded_columns : list
+        The dictionary encoded column names.
+
+    Returns
+    -------
+    list
+        The CREATE VIEW and CREATE TRIGGER statements.
+    """
+    codes = quote(codes_table_name(table_name))
+    select_cols, joins = decoded_select(table_name, columns, encoded_columns)
+    view = f'CREATE VIEW {quote(table_name)} AS SELECT {select_cols} FROM {codes} c {joins};'
+
+    def code(column, row):
+        dictionary = quote(dictionary_table_name(table_name, column))
+        return f'(SELECT code FROM {dictionary} WHERE value = {row}.{quote(column)})'
+
+    # New values are added to the dictionaries before being encoded
+    add_values = []
+    new_values = []
+    old_row = []
+    for column in columns:
+        if column in encoded_columns:
+            dictionary = quote(dictionary_table_name(table_name, column))
+            add_values.append(f'INSERT OR IGNORE INTO {dictionary}(value) '
+                              f'SELECT NEW.{quote(column)} WHERE NEW.{quote(column)} IS NOT NULL;')
+            new_values.append(code(column, 'NEW'))
+            old_row.append(f'{quote(column)} IS {code(column, "OLD")}')
+        else:
+            new_values.append(f'NEW.{quote(column)}')
+            old_row.append(f'{quote(column)} IS OLD.{quote(column)}')
+    old_rowid = f'(SELECT rowid FROM {codes} WHERE {" AND ".join(old_row)} LIMIT 1)'
+
+    insert = add_values + [f'INSERT INTO {codes}({", ".join(quote(c) for c in columns)}) '
+                           f'VALUES ({", ".join(new_values)});']
+    delete = [f'DELETE FROM {codes} WHERE rowid = {old_rowid};']
+    update = add_values + [f'UPDATE {codes} SET '
+                           f'{", ".join(f"{quote(c)} = {v}" for c, v in zip(columns, new_values))} '
+                           f'WHERE rowid = {old_rowid};']
+
+    statements = [view]
+    for event, body in (('insert', insert), ('delete', delete), ('update', update)):
+        statements.append(f'CREATE TRIGGER {quote(f"{table_name}__{event}")} INSTEAD OF {event.upper()} '
+                          f'ON {quote(table_name)} BEGIN {" ".join(body)} END;')
+    return statements
+
+
+def index_names(table_name, encoded_columns):
+    """
+    Returns the names of the indexes on the table of codes of an encoded table.
+    """
+    codes = codes_table_name(table_name)
+    return [f'{codes}__rows'] + [f'{codes}__{column}' for column in encoded_columns[1:]]
+
+
+def create_index_query(table_name, columns, encoded_columns):
+    """
+    Returns the statements indexing the table of codes of an encoded table.
+
+    One index covers all columns, encoded columns first, so that the
+    triggers of the view find a row by its values without a scan, and an
+    equality filter on the first encoded column is a search.  The other
+    encoded columns get an index of their own.  The indexes take about as
+    much space as the table of codes.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    columns : list
+        All column names, in order.
+
+    encoded_columns : list
+        The dictionary encoded column names.
+
+    Returns
+    -------
+    list
+    """
+    codes = quote(codes_table_name(table_name))
+    names = index_names(table_name, encoded_columns)
+    ordered = encoded_columns + [column for column in columns if column not in encoded_columns]
+    statements = [f'CREATE INDEX {quote(names[0])} ON {codes}({", ".join(quote(c) for c in ordered)});']
+    for name, column in zip(names[1:], encoded_columns[1:]):
+        statements.append(f'CREATE INDEX {quote(name)} ON {codes}({quote(column)});')
+    return statements
+
+
+def rename_query(table_name, change_to, columns, encoded_columns):
+    """
+    Returns the statements renaming an encoded table, its dictionaries, its
+    indexes and its view.
+    """
+    statements = [f'DROP VIEW {quote(table_name)};']
+    statements.extend(f'DROP INDEX IF EXISTS {quote(name)};' for name in index_names(table_name, encoded_columns))
+    statements.append(f'ALTER TABLE {quote(codes_table_name(table_name))} '
+                      f'RENAME TO {quote(codes_table_name(change_to))};')
+    for column in encoded_columns:
+        statements.append(f'ALTER TABLE {quote(dictionary_table_name(table_name, column))} '
+                          f'RENAME TO {quote(dictionary_table_name(change_to, column))};')
+    statements.extend(create_index_query(change_to, columns, encoded_columns))
+    statements.extend(create_view_query(change_to, columns, encoded_columns))
+    return '\n'.join(statements)
+
+
+def drop_query(table_name, encoded_columns):
+    """
+    Returns the statements dropping an encoded table, its dictionaries and its view.
+    """
+    statements = [f'DROP VIEW {quote(table_name)};',
+                  f'DROP TABLE {quote(codes_table_name(table_name))};']
+    for column in encoded_columns:
+        statements.append(f'DROP TABLE {quote(dictionary_table_name(table_name, column))};')
+    return '\n'.join(statements)
+
+
+def encode(df, encoded_columns):
+    """
+    Splits a DataFrame into integer codes and per-column dictionaries.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The data to encode.
+
+    encoded_columns : list
+        The columns to encode.
+
+    Returns
+    -------
+    Tuple(Pandas DataFrame, dict)
+        The DataFrame with encoded columns replaced by their (1-based, nullable)
+        codes, and a dict mapping each encoded column to its list of values,
+        where the value with code c is at position c - 1.
+    """
+    codes = df.copy()
+    dictionaries = dict()
+    for column in encoded_columns:
+        categorical = pd.Categorical(df[column])
+        dictionaries[column] = list(categorical.categories)
+        codes[column] = pd.array(categorical.codes + 1, dtype='Int64')
+        codes.loc[categorical.codes == -1, column] = pd.NA
+    return codes, dictionaries
+
+
+def decode(codes, dictionary):
+    """
+    Builds a Pandas Categorical from dictionary codes.
+
+    Parameters
+    ----------
+    codes : list or Pandas Series
+        The codes, with None for NULL.
+
+    dictionary : list
+        Tuples of (code, value) as stored in the dictionary table.
+
+    Returns
+    -------
+    Pandas Categorical
+    """
+    dictionary = sorted(dictionary)
+    lookup = pd.Series(range(len(dictionary)), index=[code for code, _ in dictionary])
+    positions = pd.Series(codes, dtype='float64').map(lookup).fillna(-1).astype(int)
+    return pd.Categorical.from_codes(positions, categories=[value for _, value in dictionary])
@@ -0,0 +1,92 @@
+import bz2
+import csv
+import gzip
+import json
+import lzma
+
+DEFAULT_BATCH_SIZE = 10000
+BUFFER_SIZE = 1 << 20
+
+COMPRESSIONS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+
+
+def open_output(path, compression='infer'):
+    """
+    Opens a buffered text file for writing, optionally compressed.
+
+    Parameters
+    ----------
+    path : str
+        Path to the output file.
+
+    compression : str, default='infer', Optional
+        One of 'gzip', 'bz2', 'xz' or None.  If 'infer', the compression
+        is chosen from the file extension.
+
+    Returns
+    -------
+    file object
+    """
+    if compression == 'infer':
+        compression = next((name for extension, name in EXTENSIONS.items()
+                            if str(path).endswith(extension)), None)
+    if compression is None:
+        return open(path, 'w', newline='', encoding='utf-8', buffering=BUFFER_SIZE)
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Expected compression to be one of {list(COMPRESSIONS)} or None, got {compression}.')
+    return COMPRESSIONS[compression](path, 'wt', newline='', encoding='utf-8')
+
+
+def write_csv(cursor, f, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes the rows of an executed cursor as CSV, with a header line.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    writer = csv.writer(f)
+    writer.writerow([description[0] for description in cursor.description])
+    rows = 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return rows
+        writer.writerows(batch)
+        rows += len(batch)
+
+
+def write_jsonl(cursor, f, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes the rows of an executed cursor as JSON lines, one object per row.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    column_names = [description[0] for description in cursor.description]
+    encoder = json.JSONEncoder(ensure_ascii=False, default=_to_json)
+    rows = 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return rows
+        f.write(''.join(encoder.encode(dict(zip(column_names, row))) + '\n' for row in batch))
+        rows += len(batch)
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+### HELPER FUNCTIONS
+def _to_json(item):
+    """
+    Returns a JSON serializable representation of a value SQLite can
+    return but JSON cannot encode, i.e. BLOBs as hex strings.
+    """
+    if isinstance(item, bytes):
+        return item.hex()
+    raise TypeError(f'Object of type {type(item)} is not JSON serializable')
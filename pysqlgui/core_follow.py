@@ -0,0 +1,139 @@
+import io
+import os
+import threading
+
+import pandas as pd
+
+CHECKPOINT_TABLE = '_pysqlgui_checkpoints'
+DEFAULT_BATCH_SIZE = 10000
+
+
+def create_checkpoint_query():
+    """
+    Returns the CREATE statement for the table recording how far each
+    followed file has been ingested.
+    """
+    return (f'CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE}('
+            'path TEXT PRIMARY KEY, table_name TEXT NOT NULL, '
+            'offset INTEGER NOT NULL, rows INTEGER NOT NULL, header BLOB);')
+
+
+def save_checkpoint_query():
+    """
+    Returns the statement inserting or updating the checkpoint of a file.
+    """
+    return (f'INSERT INTO {CHECKPOINT_TABLE}(path, table_name, offset, rows, header) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET '
+            'table_name = excluded.table_name, offset = excluded.offset, '
+            'rows = excluded.rows, header = excluded.header;')
+
+
+def read_batches(path, offset=0, header=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Reads the complete lines of a CSV file from a byte offset, in batches.
+    A trailing line without a newline is still being written and is left
+    for the next read.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV file.  Each record must be on a single line.
+
+    offset : int, default=0, Optional
+        Byte offset to start reading from.  If the file is now smaller than
+        the offset it is assumed to have been truncated or rotated, and is
+        read from the beginning.
+
+    header : bytes, default=None, Optional
+        The header line of the file, if it has already been read.
+
+    batch_size : int, default=DEFAULT_BATCH_SIZE, Optional
+        Maximum number of rows per batch.
+
+    Yields
+    ------
+    Tuple(Pandas DataFrame, int, bytes)
+        The rows of the batch, the offset just past them, and the header line.
+    """
+    if os.path.getsize(path) < offset:
+        offset, header = 0, None
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        if header is None:
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                return
+            offset = f.tell()
+
+        while True:
+            lines = []
+            while len(lines) < batch_size:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break
+                lines.append(line)
+            if not lines:
+                return
+
+            offset += sum(len(line) for line in lines)
+            df = pd.read_csv(io.BytesIO(header + b''.join(lines)), encoding='utf-8-sig')
+            yield df, offset, header
+            f.seek(offset)
+
+
+class Follower:
+    def __init__(self, database, path, table_name, batch_size=DEFAULT_BATCH_SIZE, interval=1.0):
+        """
+        Polls a file on a background thread and ingests new rows into a table.
+
+        Parameters
+        ----------
+        database : Database
+            The database to ingest into.
+
+        path : str
+            Path to the CSV file.
+
+        table_name : str
+            The name of the table.
+
+        batch_size : int, default=DEFAULT_BATCH_SIZE, Optional
+            Maximum number of rows inserted per transaction.
+
+        interval : float, default=1.0, Optional
+            Seconds to wait between polls.
+        """
+        self.database = database
+        self.path = path
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self.rows = 0  # rows ingested by this follower
+        self.error = None  # last exception raised while ingesting, if any
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.rows += self.database._ingest(self.path, self.table_name, self.batch_size)
+                self.error = None
+            except Exception as e:
+                self.error = e
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        """
+        Stops polling, waiting for the current batch to finish.
+
+        Returns
+        -------
+        None
+        """
+        self._stop.set()
+        self._thread.join()
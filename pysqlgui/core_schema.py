@@ -0,0 +1,394 @@
+import re
+import sqlite3
+
+import pandas as pd
+
+from pysqlgui.core_encoding import quote
+
+METADATA_TABLE = '_pysqlgui_columns'
+
+# Text formats of datetime columns, from the shortest
+DATETIME_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f']
+
+ISO_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_][\w$]*)'
+_SIMPLE_SELECT = re.compile(
+    rf'^\s*SELECT\s+(?:ALL\s+|DISTINCT\s+)?(?P<columns>.+?)\s+FROM\s+(?P<table>{_IDENTIFIER})'
+    r'(?:\s+(?:AS\s+)?(?P<alias>(?!(?:WHERE|GROUP|ORDER|LIMIT|WINDOW)\b)[A-Za-z_]\w*))?'
+    r'(?:\s+(?:WHERE|GROUP|ORDER|LIMIT)\b.*)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL)
+_COLUMN_REFERENCE = re.compile(
+    rf'^(?:(?P<qualifier>{_IDENTIFIER})\s*\.\s*)?(?P<column>\*|{_IDENTIFIER})'
+    rf'(?:\s+(?:AS\s+)?(?P<name>{_IDENTIFIER}))?$', re.IGNORECASE | re.DOTALL)
+
+
+def create_metadata_query():
+    """
+    Returns the CREATE statement for the table recording the original
+    Pandas dtype of every column added through add_table, and the text
+    format of datetime columns.
+    """
+    return (f'CREATE TABLE IF NOT EXISTS {METADATA_TABLE}('
+            'table_name TEXT NOT NULL, column_name TEXT NOT NULL, position INTEGER NOT NULL, '
+            'dtype TEXT NOT NULL, sql_type TEXT NOT NULL, format TEXT, '
+            'PRIMARY KEY (table_name, column_name));')
+
+
+def datetime_formats(df):
+    """
+    Returns the shortest text format that stores the values of each
+    datetime column of a DataFrame without loss, from DATETIME_FORMATS.
+    Dates are stored as '%Y-%m-%d' if every value is at midnight.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The data.
+
+    Returns
+    -------
+    dict
+        Maps the datetime column names to their format.
+    """
+    formats = dict()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            timestamps = _naive(df[column]).dropna()
+            if (timestamps.dt.microsecond != 0).any():
+                formats[column] = DATETIME_FORMATS[2]
+            elif ((timestamps - timestamps.dt.normalize()) != pd.Timedelta(0)).any():
+                formats[column] = DATETIME_FORMATS[1]
+            else:
+                formats[column] = DATETIME_FORMATS[0]
+    return formats
+
+
+def widen_format_query(table_name, column, old, new):
+    """
+    Returns the UPDATE rewriting the values of a datetime column stored in
+    a format of DATETIME_FORMATS into a longer one, e.g. '2020-01-02' into
+    '2020-01-02 00:00:00'.  Values not in the old format are left as they are.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table holding the values.
+
+    column : str
+        The name of the column.
+
+    old : str
+        The format the values are stored in.
+
+    new : str
+        The longer format.
+
+    Returns
+    -------
+    str
+    """
+    midnight = pd.Timestamp(2000, 1, 1)
+    length = len(midnight.strftime(old))
+    suffix = midnight.strftime(new)[length:]
+    return (f"UPDATE {quote(table_name)} SET {quote(column)} = {quote(column)} || '{suffix}' "
+            f'WHERE length({quote(column)}) = {length};')
+
+
+def infer_schema(df, strict=False):
+    """
+    Tightens the dtypes of a DataFrame and infers a SQLite type for each column.
+
+    Float columns holding only whole numbers become nullable integers, and
+    text columns holding only ISO 8601 dates become datetime64.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The data.
+
+    strict : bool, default=False, Optional
+        If True, only types allowed in SQLite STRICT tables are used.
+
+    Returns
+    -------
+    Tuple(Pandas DataFrame, list)
+        The converted DataFrame, and a list of (column name, dtype, SQL type).
+    """
+    converted = dict()
+    schema = []
+    for column in df.columns:
+        values = tighten(df[column])
+        converted[column] = values
+        schema.append((column, str(values.dtype), sql_type(values, strict)))
+    return pd.DataFrame(converted, index=df.index), schema
+
+
+def tighten(values):
+    """
+    Returns a Series converted to the most specific dtype its values allow.
+
+    Only float columns holding NULLs are narrowed to integers, as those
+    are the integer columns pandas turns into floats (e.g. reading a CSV);
+    a float column without NULLs keeps the dtype chosen by the caller.
+    """
+    non_null = values.dropna()
+    if non_null.empty:
+        return values
+
+    if pd.api.types.is_float_dtype(values):
+        if len(non_null) < len(values) and (non_null % 1 == 0).all() and non_null.abs().max() < 2 ** 53:
+            return values.astype('Int64')
+    elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values
+        if all(isinstance(v, str) and ISO_DATE_PATTERN.match(v) for v in non_null):
+            try:
+                return pd.to_datetime(values, format='ISO8601')
+            except (ValueError, TypeError):
+                return values
+    return values
+
+
+def sql_type(values, strict=False):
+    """
+    Returns the SQLite type used to store a Series.
+    """
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(values):
+        return 'REAL'
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 'TEXT'
+
+    non_null = values.dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        non_null = non_null.astype(object)
+    if all(isinstance(v, str) for v in non_null):
+        return 'TEXT'
+    return 'ANY' if strict else 'BLOB'
+
+
+def create_table_query(table_name, schema, strict=False):
+    """
+    Returns the CREATE statement for a table with an inferred schema.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    schema : list
+        Tuples of (column name, dtype, SQL type), as returned by infer_schema.
+
+    strict : bool, default=False, Optional
+        If True, creates a SQLite STRICT table (SQLite 3.37 or later).
+
+    Returns
+    -------
+    str
+    """
+    if strict and sqlite3.sqlite_version_info < (3, 37, 0):
+        raise ValueError(f'STRICT tables require SQLite 3.37 or later, got {sqlite3.sqlite_version}.')
+    columns = ', '.join(f'{quote(column)} {column_type}' for column, _, column_type in schema)
+    return f'CREATE TABLE {quote(table_name)}({columns}){" STRICT" if strict else ""};'
+
+
+def to_rows(df, formats=None):
+    """
+    Returns the rows of a DataFrame as tuples of values SQLite can bind,
+    with NULLs as None, booleans as integers and datetimes as ISO 8601 text.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The data.
+
+    formats : dict, default=None, Optional
+        The recorded text format of datetime columns.  The format of other
+        datetime columns is chosen from their values.
+
+    Returns
+    -------
+    list
+    """
+    formats = dict(formats or {})
+    chosen = datetime_formats(df)
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            fmt = formats.get(column, chosen[column])
+            if fmt in DATETIME_FORMATS and DATETIME_FORMATS.index(chosen[column]) > DATETIME_FORMATS.index(fmt):
+                raise ValueError(f'Values of {column} do not fit its stored format {fmt}.')
+            values = _naive(values).dt.strftime(fmt)
+        elif pd.api.types.is_bool_dtype(values):
+            values = values.astype('Int64')
+        values = values.astype(object)
+        columns.append(values.where(values.notna(), None).tolist())
+    return list(zip(*columns))
+
+
+def result_columns(query):
+    """
+    Finds the result columns of a query that are copied unchanged from a
+    column of a table, so the recorded dtype of that column applies to them.
+    Only SELECTs from a single table are recognized, other queries (joins,
+    subqueries, compound SELECTs) return None.
+
+    Parameters
+    ----------
+    query : str
+        A SQL query.
+
+    Returns
+    -------
+    Tuple(str, list), or None
+        The name of the table, and a list of (result column name, table
+        column name) pairs, where ('*', '*') stands for all columns.
+    """
+    match = _SIMPLE_SELECT.match(query)
+    if match is None or re.search(r'\b(SELECT|JOIN|UNION|INTERSECT|EXCEPT)\b', match.group('columns') +
+                                  query[match.end('table'):], re.IGNORECASE):
+        return None
+
+    table_name = _unquote(match.group('table'))
+    qualifiers = {table_name.lower()}
+    if match.group('alias'):
+        qualifiers.add(match.group('alias').lower())
+
+    columns = []
+    for item in _split_columns(match.group('columns')):
+        reference = _COLUMN_REFERENCE.match(item.strip())
+        if reference is None:
+            continue
+        qualifier = reference.group('qualifier')
+        if qualifier is not None and _unquote(qualifier).lower() not in qualifiers:
+            continue
+        if reference.group('column') == '*':
+            if reference.group('name') is None:
+                columns.append(('*', '*'))
+            continue
+        column = _unquote(reference.group('column'))
+        name = _unquote(reference.group('name')) if reference.group('name') else column
+        columns.append((name, column))
+    return table_name, columns
+
+
+def build_frame(rows, column_names, dtypes):
+    """
+    Builds a DataFrame from query results, restoring recorded Pandas dtypes.
+
+    A recorded dtype is only applied when every value in the column can be
+    converted to it without loss, otherwise the column is inferred by Pandas.
+
+    Parameters
+    ----------
+    rows : list
+        The rows, as returned by cursor.fetchall().
+
+    column_names : list
+        The column names of the result.
+
+    dtypes : dict
+        Maps column names to their recorded dtype.
+
+    Returns
+    -------
+    Pandas DataFrame
+    """
+    if not dtypes or len(set(column_names)) != len(column_names):
+        return pd.DataFrame(data=rows, columns=column_names)
+
+    columns = list(zip(*rows)) if rows else [()] * len(column_names)
+    data = dict()
+    for name, values in zip(column_names, columns):
+        data[name] = restore(list(values), dtypes.get(name))
+    return pd.DataFrame(data, columns=column_names)
+
+
+def restore(values, dtype):
+    """
+    Returns a Series of values with the given recorded dtype, or with an
+    inferred dtype if the values do not fit it.
+    """
+    if dtype is None:
+        return pd.Series(values)
+
+    non_null = [v for v in values if v is not None]
+    has_nulls = len(non_null) < len(values)
+
+    if dtype in ('bool', 'boolean'):
+        if all(type(v) is int and v in (0, 1) for v in non_null):
+            return pd.Series(values, dtype='boolean' if has_nulls else dtype)
+    elif re.match(r'^u?int\d*$', dtype, re.IGNORECASE):
+        if all(type(v) is int for v in non_null):
+            # NumPy integer dtypes cannot hold NULLs, use the nullable equivalent
+            if has_nulls and dtype.islower():
+                dtype = dtype.capitalize() if dtype.startswith('int') else 'U' + dtype[1:].capitalize()
+            return pd.Series(values, dtype=dtype)
+    elif dtype.startswith('float'):
+        if all(isinstance(v, (int, float)) for v in non_null):
+            return pd.Series(values, dtype=dtype)
+    elif dtype.startswith('datetime64'):
+        if all(isinstance(v, str) for v in non_null):
+            try:
+                timestamps = pd.Series(pd.to_datetime(values, format='ISO8601'))
+                tz = getattr(pd.api.types.pandas_dtype(dtype), 'tz', None)
+                if tz is not None:
+                    timestamps = timestamps.dt.tz_localize('UTC').dt.tz_convert(tz)
+                return timestamps.astype(dtype)
+            except (ValueError, TypeError):
+                pass
+    elif dtype == 'category':
+        if all(isinstance(v, str) for v in non_null):
+            return pd.Series(values, dtype='category')
+    return pd.Series(values)
+
+
+### HELPER FUNCTIONS
+def _naive(timestamps):
+    """
+    Returns datetimes converted to UTC, without time zone.
+    """
+    if timestamps.dt.tz is not None:
+        return timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    return timestamps
+
+
+def _unquote(identifier):
+    """
+    Returns an SQL identifier without its quotes.
+    """
+    if identifier[0] == '"':
+        return identifier[1:-1].replace('""', '"')
+    if identifier[0] in '`[':
+        return identifier[1:-1]
+    return identifier
+
+
+def _split_columns(columns):
+    """
+    Splits the column list of a SELECT on the commas outside of
+    parentheses and quotes.
+    """
+    items = ['']
+    depth = 0
+    quote = None
+    for char in columns:
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '[':
+            quote = ']'
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append('')
+            continue
+        items[-1] += char
+    return items
@@ -0,0 +1,163 @@
+from pysqlgui.core_encoding import quote, codes_table_name, dictionary_table_name, decoded_select
+
+# FTS5 creates these tables next to every full-text index
+SHADOW_SUFFIXES = ['_data', '_idx', '_content', '_docsize', '_config']
+
+
+def fts_table_name(table_name):
+    """
+    Returns the name of the FTS5 table indexing a table.
+    """
+    return f'{table_name}__fts'
+
+
+def shadow_table_names(fts_name):
+    """
+    Returns the names of the tables FTS5 may create for a full-text index.
+    """
+    return [fts_name + suffix for suffix in SHADOW_SUFFIXES]
+
+
+def create_index_query(table_name, columns, encoded_columns):
+    """
+    Returns the statements creating and populating a full-text index on
+    columns of a table, and the triggers keeping it in sync.
+
+    The index is built on the table holding the rows, i.e. the table of
+    codes of an encoded table, and keyed on its rowids.  If none of the
+    indexed columns are encoded, the index is an external content FTS5
+    table that reads the text from the table itself.  Otherwise the decoded
+    text is stored in the index.  VACUUM may change the rowids, after which
+    the index must be rebuilt with rebuild_index_query.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    columns : list
+        The columns to index.
+
+    encoded_columns : list
+        The dictionary encoded columns of the table.
+
+    Returns
+    -------
+    list
+    """
+    fts = quote(fts_table_name(table_name))
+    source = codes_table_name(table_name) if encoded_columns else table_name
+    indexed = ', '.join(quote(column) for column in columns)
+    if _is_external(columns, encoded_columns):
+        content = source.replace("'", "''")
+        statements = [f"CREATE VIRTUAL TABLE {fts} USING fts5({indexed}, content='{content}', content_rowid='rowid');"]
+        delete = (f"INSERT INTO {fts}({fts}, rowid, {indexed}) "
+                  f"VALUES ('delete', OLD.rowid, {_values(table_name, columns, encoded_columns, 'OLD')});")
+    else:
+        statements = [f'CREATE VIRTUAL TABLE {fts} USING fts5({indexed});']
+        delete = f'DELETE FROM {fts} WHERE rowid = OLD.rowid;'
+    statements += rebuild_index_query(table_name, columns, encoded_columns)
+    insert = (f'INSERT INTO {fts}(rowid, {indexed}) '
+              f'VALUES (NEW.rowid, {_values(table_name, columns, encoded_columns, "NEW")});')
+
+    triggers = {'insert': ('AFTER INSERT', insert),
+                'delete': ('AFTER DELETE', delete),
+                'update': ('AFTER UPDATE', delete + ' ' + insert)}
+    for name, (event, body) in triggers.items():
+        trigger = quote(f'{fts_table_name(table_name)}_{name}')
+        statements.append(f'CREATE TRIGGER {trigger} {event} ON {quote(source)} BEGIN {body} END;')
+    return statements
+
+
+def rebuild_index_query(table_name, columns, encoded_columns):
+    """
+    Returns the statements refilling the full-text index of a table from
+    its rows, e.g. after VACUUM changed their rowids.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    columns : list
+        The indexed columns.
+
+    encoded_columns : list
+        The dictionary encoded columns of the table.
+
+    Returns
+    -------
+    list
+    """
+    fts = quote(fts_table_name(table_name))
+    if _is_external(columns, encoded_columns):
+        return [f"INSERT INTO {fts}({fts}) VALUES ('rebuild');"]
+    source = quote(codes_table_name(table_name) if encoded_columns else table_name)
+    indexed = ', '.join(quote(column) for column in columns)
+    return [f'DELETE FROM {fts};',
+            f'INSERT INTO {fts}(rowid, {indexed}) '
+            f'SELECT rowid, {_values(table_name, columns, encoded_columns, source)} FROM {source};']
+
+
+def drop_index_query(table_name):
+    """
+    Returns the statements dropping the full-text index of a table and its triggers.
+    """
+    fts = fts_table_name(table_name)
+    statements = [f'DROP TRIGGER IF EXISTS {quote(f"{fts}_{name}")};' for name in ('insert', 'delete', 'update')]
+    statements.append(f'DROP TABLE IF EXISTS {quote(fts)};')
+    return '\n'.join(statements)
+
+
+def search_query(table_name, columns, encoded_columns, limit):
+    """
+    Returns the SELECT of the rows of a table matching a full-text query,
+    best matches first.  The query string is bound as the only parameter.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    columns : list
+        All column names of the table, in order.
+
+    encoded_columns : list
+        The dictionary encoded columns of the table.
+
+    limit : int
+        Maximum number of rows returned.
+
+    Returns
+    -------
+    str
+    """
+    # FTS5 only accepts the full table name, not an alias, on the left of MATCH
+    fts = quote(fts_table_name(table_name))
+    source = codes_table_name(table_name) if encoded_columns else table_name
+    select_cols, joins = decoded_select(table_name, columns, encoded_columns)
+    return (f'SELECT {select_cols} FROM {fts} JOIN {quote(source)} c ON c.rowid = {fts}.rowid {joins} '
+            f'WHERE {fts} MATCH ? ORDER BY {fts}.rank LIMIT {int(limit)};')
+
+
+### HELPER FUNCTIONS
+def _is_external(columns, encoded_columns):
+    """
+    Returns True if the index reads its text from the table, i.e. none of
+    the indexed columns are encoded.
+    """
+    return not any(column in encoded_columns for column in columns)
+
+
+def _values(table_name, columns, encoded_columns, row):
+    """
+    Returns the text of the indexed columns of a row, decoding encoded columns.
+    """
+    expressions = []
+    for column in columns:
+        if column in encoded_columns:
+            dictionary = quote(dictionary_table_name(table_name, column))
+            expressions.append(f'(SELECT value FROM {dictionary} WHERE code = {row}.{quote(column)})')
+        else:
+            expressions.append(f'{row}.{quote(column)}')
+    return ', '.join(expressions)
@@ -0,0 +1,439 @@
+import hmac
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # optional, batches are sent as JSON without it
+    pyarrow = None
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 10000
+
+# Database methods a Client may call
+REMOTE_METHODS = {'select', 'run_query', 'show', 'info', 'summary', 'sample',
+                  'approx_distinct', 'approx_quantile', 'add_table', 'insert_data',
+                  'create_table', 'rename_table', 'drop_table', 'create_text_index', 'search'}
+
+FORMATS = ['arrow', 'json'] if pyarrow is not None else ['json']
+
+_LENGTH = struct.Struct('>I')
+
+# First byte of every batch frame
+_TAGS = {'arrow': b'A', 'json': b'J', 'error': b'E'}
+
+
+class DatabaseServer:
+    def __init__(self, database, address=None, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 token=None):
+        """
+        Serves a loaded Database to local clients.  Each client connection is
+        handled by a pool of worker threads, and DataFrame results are sent
+        in batches of Arrow record batches (if pyarrow is installed) or JSON.
+
+        Each worker runs SELECT queries on its own read-only connection, so
+        they run concurrently.  An in-memory database is first moved to a
+        temporary file for that, which Database.close() deletes.  Other
+        requests share the Database's connection, one at a time.
+
+        Clients can run any SQL with the permissions of the server process
+        (e.g. ATTACH a file), so access should be restricted: a Unix socket
+        is only accessible to the user running the server, and a token can
+        be required from clients.  Remote add_table and insert_data only
+        accept DataFrames, never paths or URLs read by the server.
+
+        Parameters
+        ----------
+        database : Database
+            The database to serve.
+
+        address : str or tuple, default=None, Optional
+            A filepath to listen on a Unix socket, or a (host, port) tuple to
+            listen on TCP.  Defaults to (DEFAULT_HOST, DEFAULT_PORT).  An
+            existing socket at the filepath is replaced, any other file is
+            left alone and raises a ValueError.  The socket is only
+            accessible to its owner.
+
+        workers : int, default=DEFAULT_WORKERS, Optional
+            Number of worker threads serving clients.
+
+        batch_size : int, default=DEFAULT_BATCH_SIZE, Optional
+            Number of rows per batch sent to clients.
+
+        token : str, default=None, Optional
+            If provided, requests without this token are refused.
+        """
+        self.database = database
+        self.address = address if address is not None else (DEFAULT_HOST, DEFAULT_PORT)
+        self.batch_size = batch_size
+        self.token = token
+        self._thread = None
+
+        # read-only connection of each worker thread, other connections
+        # cannot open an in-memory database
+        database._move_to_file()
+        self._read_only = os.path.isfile(database.path)
+        self._local = threading.local()
+        self._connections = []
+
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle(self.request)
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            if not stat.S_ISSOCK(os.stat(self.address).st_mode):
+                raise ValueError(f'Could not listen on {self.address}, the file exists and is not a socket.')
+            os.remove(self.address)
+
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        if isinstance(self.address, str):
+            self._server = _PooledUnixServer(self.address, Handler, self._pool)
+        else:
+            self._server = _PooledTCPServer(tuple(self.address), Handler, self._pool)
+            self.address = self._server.server_address
+
+    def serve_forever(self):
+        """
+        Serves clients until shutdown() is called.
+
+        Returns
+        -------
+        None
+        """
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        Serves clients on a background thread.
+
+        Returns
+        -------
+        None
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """
+        Stops serving clients and closes the socket.
+
+        Returns
+        -------
+        None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._pool.shutdown(wait=False)
+        if self._thread is not None:
+            self._thread.join()
+        for connection in self._connections:
+            connection.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def _handle(self, sock):
+        """
+        Answers the requests of one client connection until it is closed.
+        """
+        while True:
+            try:
+                request = json.loads(_recv_frame(sock))
+            except (ConnectionError, ValueError):
+                return
+
+            try:
+                if self.token is not None and not hmac.compare_digest(str(request.get('token')), self.token):
+                    raise PermissionError('Invalid token.')
+                method = request['method']
+                if method not in REMOTE_METHODS:
+                    raise ValueError(f'Method not available remotely: {method}.')
+                args = [_decode(arg) for arg in request.get('args', [])]
+                kwargs = {key: _decode(value) for key, value in request.get('kwargs', {}).items()}
+                _check_data(method, args, kwargs)
+                query = args[0] if args else kwargs.get('query')
+                if (self._read_only and method in ('select', 'run_query') and len(args) + len(kwargs) == 1
+                        and isinstance(query, str) and query.lstrip().upper().startswith('SELECT')):
+                    result = self.database._select(query, self._read_connection())
+                else:
+                    result = getattr(self.database, method)(*args, **kwargs)
+                if not isinstance(result, pd.DataFrame):
+                    header = json.dumps({'status': 'ok', 'kind': 'value', 'value': result,
+                                         'tuple': isinstance(result, tuple)}, default=_to_json).encode()
+            except Exception as e:
+                _send_frame(sock, _error(e))
+                continue
+
+            if not isinstance(result, pd.DataFrame):
+                _send_frame(sock, header)
+                continue
+
+            formats = [f for f in request.get('formats', ['json']) if f in FORMATS] or ['json']
+            _send_frame(sock, json.dumps({'status': 'ok', 'kind': 'frame',
+                                          'columns': [str(c) for c in result.columns],
+                                          'dtypes': [str(dtype) for dtype in result.dtypes]}).encode())
+            for start in range(0, max(len(result), 1), self.batch_size):
+                try:
+                    payload = _serialize(result.iloc[start:start + self.batch_size], formats)
+                except Exception as e:
+                    payload = _TAGS['error'] + _error(e)
+                _send_frame(sock, payload)
+                if payload.startswith(_TAGS['error']):
+                    break
+            else:
+                _send_frame(sock, b'')
+
+    def _read_connection(self):
+        """
+        Returns the read-only connection of the current worker thread.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.database._connect(read_only=True)
+            self._connections.append(connection)
+        return connection
+
+
+class Client:
+    def __init__(self, address=None, token=None):
+        """
+        Client of a DatabaseServer.  The Database methods available
+        remotely (select, run_query, show, info, summary, sample,
+        approx_distinct, approx_quantile, add_table, insert_data,
+        create_table, rename_table, drop_table, create_text_index and
+        search) can be called on the
+        Client with the same arguments.  Each call uses its own connection,
+        so a Client can be shared between threads.
+
+        Parameters
+        ----------
+        address : str or tuple, default=None, Optional
+            The filepath of the server's Unix socket, or its (host, port).
+            Defaults to (DEFAULT_HOST, DEFAULT_PORT).
+
+        token : str, default=None, Optional
+            The token required by the server, if any.
+        """
+        self.address = address if address is not None else (DEFAULT_HOST, DEFAULT_PORT)
+        self.token = token
+        if not isinstance(self.address, str):
+            self.address = tuple(self.address)
+
+    def __getattr__(self, method):
+        if method not in REMOTE_METHODS:
+            raise AttributeError(f'{type(self).__name__} has no attribute {method}')
+
+        def call(*args, **kwargs):
+            return self._call(method, args, kwargs)
+        call.__name__ = method
+        return call
+
+    def _call(self, method, args, kwargs):
+        request = {'method': method, 'formats': FORMATS, 'token': self.token,
+                   'args': [_encode(arg) for arg in args],
+                   'kwargs': {key: _encode(value) for key, value in kwargs.items()}}
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.connect(self.address)
+            _send_frame(sock, json.dumps(request).encode())
+            header = json.loads(_recv_frame(sock))
+            if header['status'] == 'error':
+                _raise(header)
+            if header['kind'] == 'value':
+                value = header['value']
+                return tuple(value) if header['tuple'] else value
+
+            batches = []
+            while True:
+                payload = _recv_frame(sock)
+                if not payload:
+                    break
+                if payload.startswith(_TAGS['error']):
+                    _raise(json.loads(payload[1:]))
+                batches.append(_deserialize(payload, header['dtypes']))
+        if not batches:
+            return pd.DataFrame(columns=header['columns'])
+        return pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0].reset_index(drop=True)
+
+
+class _PooledServerMixIn:
+    """
+    Hands each accepted connection to a thread pool, rather than starting
+    a thread per connection like socketserver.ThreadingMixIn.
+    """
+    def __init__(self, address, handler, pool):
+        self._pool = pool
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class _PooledTCPServer(_PooledServerMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _PooledUnixServer(_PooledServerMixIn, socketserver.UnixStreamServer):
+        def server_bind(self):
+            # before listen(), so no other user can connect in between
+            super().server_bind()
+            os.chmod(self.server_address, stat.S_IRUSR | stat.S_IWUSR)
+else:
+    _PooledUnixServer = None
+
+
+### HELPER FUNCTIONS
+def _send_frame(sock, payload):
+    """
+    Sends a length-prefixed message.
+    """
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_frame(sock):
+    """
+    Receives a length-prefixed message.
+    """
+    (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return _recv_exactly(sock, length)
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1 << 20))
+        if not chunk:
+            raise ConnectionError('Connection closed.')
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _serialize(df, formats):
+    """
+    Serializes a batch of rows as an Arrow IPC stream, or as JSON if Arrow
+    is not in formats or cannot convert the batch (e.g. a column holding
+    both text and numbers).  The first byte of the result tells which.
+    """
+    if 'arrow' in formats:
+        try:
+            table = pyarrow.Table.from_pandas(df, preserve_index=False)
+            sink = io.BytesIO()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return _TAGS['arrow'] + sink.getvalue()
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            pass
+    data = df.to_json(orient='split', index=False, date_format='iso', date_unit='us', default_handler=str)
+    return _TAGS['json'] + data.encode()
+
+
+def _deserialize(payload, dtypes):
+    """
+    Deserializes a batch of rows, restoring the dtypes of JSON batches.
+    """
+    if payload.startswith(_TAGS['arrow']):
+        return pyarrow.ipc.open_stream(payload[1:]).read_all().to_pandas()
+    split = json.loads(payload[1:])
+    df = pd.DataFrame(split['data'], columns=split['columns'])
+    for i, dtype in enumerate(dtypes):
+        try:
+            df.isetitem(i, _restore(df.iloc[:, i], dtype))
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def _restore(values, dtype):
+    """
+    Converts a column decoded from JSON back to its original dtype.
+    """
+    if dtype.startswith('datetime64'):
+        timestamps = pd.to_datetime(values, format='ISO8601', utc=True)
+        tz = getattr(pd.api.types.pandas_dtype(dtype), 'tz', None)
+        timestamps = timestamps.dt.tz_convert(tz) if tz is not None else timestamps.dt.tz_localize(None)
+        return timestamps.astype(dtype)
+    if dtype in ('object', 'str'):
+        return values
+    return values.astype(dtype)
+
+
+def _check_data(method, args, kwargs):
+    """
+    Raises a TypeError unless the data of a remote add_table or insert_data
+    call is made of DataFrames, as paths and URLs would be read by the server.
+    """
+    if method == 'add_table':
+        data = args[0] if args else kwargs.get('data')
+        if isinstance(data, dict):
+            frames = list(data.values())
+        else:
+            frames = data if isinstance(data, list) else [data]
+    elif method == 'insert_data':
+        frames = [args[1] if len(args) > 1 else kwargs.get('data')]
+    else:
+        return
+    if not all(isinstance(df, pd.DataFrame) for df in frames):
+        raise TypeError(f'Expected the data of a remote {method} to be Pandas DataFrames.')
+
+
+def _error(e):
+    """
+    Returns the error response to a request.
+    """
+    return json.dumps({'status': 'error', 'type': type(e).__name__, 'message': str(e)}).encode()
+
+
+def _raise(response):
+    errors = {'TypeError': TypeError, 'PermissionError': PermissionError}
+    raise errors.get(response['type'], ValueError)(response['message'])
+
+
+def _encode(arg):
+    """
+    Encodes a method argument as JSON, with DataFrames in split orientation.
+    """
+    if isinstance(arg, pd.DataFrame):
+        return {'__dataframe__': json.loads(arg.to_json(orient='split', index=False, date_format='iso'))}
+    if isinstance(arg, dict):
+        return {key: _encode(value) for key, value in arg.items()}
+    if isinstance(arg, (list, tuple)):
+        return [_encode(value) for value in arg]
+    return arg
+
+
+def _decode(arg):
+    if isinstance(arg, dict):
+        if set(arg) == {'__dataframe__'}:
+            split = arg['__dataframe__']
+            return pd.DataFrame(split['data'], columns=split['columns'])
+        return {key: _decode(value) for key, value in arg.items()}
+    if isinstance(arg, list):
+        return [_decode(value) for value in arg]
+    return arg
+
+
+def _to_json(item):
+    if hasattr(item, 'item'):
+        return item.item()
+    return str(item)
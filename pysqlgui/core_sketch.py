@@ -0,0 +1,397 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESERVOIR_SIZE = 10000
+DEFAULT_HLL_PRECISION = 12
+DEFAULT_TDIGEST_COMPRESSION = 200
+DEFAULT_TOP_VALUES_CAPACITY = 1000
+AGGREGATE_BUFFER_SIZE = 10000
+
+
+class Reservoir:
+    def __init__(self, size=DEFAULT_RESERVOIR_SIZE, seed=None):
+        """
+        A uniform random sample of fixed maximum size over every row
+        ever added (Algorithm R).
+
+        Parameters
+        ----------
+        size : int, default=DEFAULT_RESERVOIR_SIZE, Optional
+            The maximum number of rows kept in the sample.
+
+        seed : int, default=None, Optional
+            Seed for the random number generator.
+        """
+        self.size = size
+        self.seen = 0
+        self.rows = []
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, df):
+        """
+        Offers the rows of a Pandas DataFrame to the reservoir.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            The new rows.
+
+        Returns
+        -------
+        None
+        """
+        n = len(df)
+        if n == 0:
+            return
+
+        positions = np.arange(self.seen, self.seen + n)
+        slots = np.full(n, -1)
+        fill = positions < self.size
+        slots[fill] = positions[fill]
+
+        # Row i (0-based over all rows seen) replaces a random slot with
+        # probability size / (i + 1).
+        draws = self._rng.integers(0, positions[~fill] + 1)
+        accepted = draws < self.size
+        slots[np.flatnonzero(~fill)[accepted]] = draws[accepted]
+
+        chosen = np.flatnonzero(slots >= 0)
+        records = df.iloc[chosen].to_dict(orient='records')
+        for slot, record in zip(slots[chosen], records):
+            if slot == len(self.rows):
+                self.rows.append(record)
+            else:
+                self.rows[slot] = record
+        self.seen += n
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        """
+        HyperLogLog sketch for estimating the number of distinct values.
+
+        Parameters
+        ----------
+        precision : int, default=DEFAULT_HLL_PRECISION, Optional
+            Number of bits used to select a register (2 ** precision registers).
+        """
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        """
+        Adds values to the sketch. NULL values are ignored.
+
+        Parameters
+        ----------
+        values : Pandas Series or list
+            The values to add.
+
+        Returns
+        -------
+        None
+        """
+        values = pd.Series(values, dtype=object if isinstance(values, list) else None).dropna()
+        if values.empty:
+            return
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << width) - 1)
+        rank = (width - _bit_length(remainder) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Merges another HyperLogLog sketch of the same precision into this one.
+
+        Parameters
+        ----------
+        other : HyperLogLog
+            The sketch to merge.
+
+        Returns
+        -------
+        None
+        """
+        if other.precision != self.precision:
+            raise ValueError(f'Expected precision {self.precision}, got {other.precision}.')
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        """
+        Returns
+        -------
+        float
+            Estimated number of distinct values.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros > 0:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
+
+    def error(self):
+        """
+        Returns
+        -------
+        float
+            Standard error of the estimate, in number of distinct values.
+        """
+        return 1.04 / math.sqrt(len(self.registers)) * self.estimate()
+
+
+class TDigest:
+    def __init__(self, compression=DEFAULT_TDIGEST_COMPRESSION):
+        """
+        t-digest sketch for estimating quantiles of numeric values.
+
+        Parameters
+        ----------
+        compression : int, default=DEFAULT_TDIGEST_COMPRESSION, Optional
+            Controls the number of centroids kept, trading size for accuracy.
+        """
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        """
+        Adds values to the sketch. NULL and non-numeric values are ignored.
+
+        Parameters
+        ----------
+        values : Pandas Series or list
+            The values to add.
+
+        Returns
+        -------
+        None
+        """
+        values = pd.to_numeric(pd.Series(values), errors='coerce').dropna()
+        values = values.to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other):
+        """
+        Merges another TDigest into this one.
+
+        Parameters
+        ----------
+        other : TDigest
+            The sketch to merge.
+
+        Returns
+        -------
+        None
+        """
+        if other.count == 0:
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        # Group neighbouring centroids whose left edge falls in the same unit
+        # of the k1 scale function, which keeps the tails finely resolved.
+        left = (np.cumsum(weights) - weights) / total
+        scale = self.compression / (2 * math.pi) * np.arcsin(2 * left - 1)
+        groups = np.floor(scale).astype(np.int64)
+        groups -= groups.min()
+
+        merged_weights = np.bincount(groups, weights=weights)
+        merged_sums = np.bincount(groups, weights=means * weights)
+        keep = merged_weights > 0
+        self.weights = merged_weights[keep]
+        self.means = merged_sums[keep] / self.weights
+
+    def quantile(self, q):
+        """
+        Estimates a quantile.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        Tuple(float, float)
+            The estimate and a bound on its absolute error, or (None, None)
+            if the sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError(f'Expected 0 <= q <= 1, got {q}.')
+        if len(self.means) == 0:
+            return (None, None)
+
+        centers = np.cumsum(self.weights) - self.weights / 2
+        points = np.concatenate([[0], centers, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        target = q * self.count
+
+        i = int(np.clip(np.searchsorted(points, target, side='right'), 1, len(points) - 1))
+        estimate = float(np.interp(target, points, values))
+        return (estimate, float(values[i] - values[i - 1]) / 2)
+
+
+class TopValues:
+    def __init__(self, capacity=DEFAULT_TOP_VALUES_CAPACITY):
+        """
+        Tracks the most frequent values in bounded memory.  Counts are exact
+        as long as there are at most capacity distinct values, and otherwise
+        never overestimate the true count (Misra-Gries).
+
+        Parameters
+        ----------
+        capacity : int, default=DEFAULT_TOP_VALUES_CAPACITY, Optional
+            The maximum number of distinct values tracked.
+        """
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        """
+        Adds values to the sketch. NULL values are ignored.
+
+        Parameters
+        ----------
+        values : Pandas Series or list
+            The values to add.
+
+        Returns
+        -------
+        None
+        """
+        counts = pd.Series(values, dtype=object).value_counts()
+        if counts.empty:
+            return
+        counts = counts.add(self.counts, fill_value=0) if not self.counts.empty else counts
+        if len(counts) > self.capacity:
+            # Subtract the (capacity + 1)-th largest count from every count
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts[counts > threshold] - threshold
+        self.counts = counts.astype('int64')
+
+    def top(self, k):
+        """
+        Returns
+        -------
+        list
+            Up to k (value, count) pairs, most frequent first.
+        """
+        top = self.counts.sort_values(ascending=False, kind='mergesort').head(k)
+        return [(value.item() if hasattr(value, 'item') else value, int(count)) for value, count in top.items()]
+
+
+class ApproxCountDistinct:
+    """
+    SQLite aggregate: approx_count_distinct(column).  Like every aggregate
+    defined in Python, returns NULL rather than 0 when there are no rows,
+    wrap it in COALESCE(..., 0) where 0 is needed.
+    """
+    def __init__(self):
+        self.sketch = HyperLogLog()
+        self.buffer = []
+
+    def step(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= AGGREGATE_BUFFER_SIZE:
+            self.sketch.update(self.buffer)
+            self.buffer = []
+
+    def finalize(self):
+        self.sketch.update(self.buffer)
+        return int(round(self.sketch.estimate()))
+
+
+class ApproxQuantile:
+    """
+    SQLite aggregate: approx_quantile(column, q).
+    """
+    def __init__(self):
+        self.sketch = TDigest()
+        self.buffer = []
+        self.q = None
+
+    def step(self, value, q):
+        self.q = q
+        self.buffer.append(value)
+        if len(self.buffer) >= AGGREGATE_BUFFER_SIZE:
+            self.sketch.update(self.buffer)
+            self.buffer = []
+
+    def finalize(self):
+        self.sketch.update(self.buffer)
+        if self.q is None:
+            return None
+        return self.sketch.quantile(self.q)[0]
+
+
+class TopValuesAggregate:
+    """
+    SQLite aggregate: top_values(column, k), returning a JSON list of
+    [value, count] pairs.
+    """
+    def __init__(self):
+        self.sketch = TopValues()
+        self.buffer = []
+        self.k = None
+
+    def step(self, value, k):
+        self.k = k
+        self.buffer.append(value)
+        if len(self.buffer) >= AGGREGATE_BUFFER_SIZE:
+            self.sketch.update(self.buffer)
+            self.buffer = []
+
+    def finalize(self):
+        self.sketch.update(self.buffer)
+        if self.k is None:
+            return json.dumps([])
+        return json.dumps(self.sketch.top(self.k), default=str)
+
+
+### HELPER FUNCTIONS
+def _bit_length(values):
+    """
+    Returns the bit length of each element of an array of unsigned 64-bit integers.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Array of dtype uint64.
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
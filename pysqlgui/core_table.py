@@ -1,17 +1,38 @@
+import pandas as pd
+
+from pysqlgui.core_sketch import Reservoir, HyperLogLog, TDigest
+
 class Table:
-    def __init__(self, df, name):
+    def __init__(self, df, name, encoded_columns=None, dtypes=None, formats=None):
         """
         Parameters
         ----------
         df : Pandas DataFrame
             Pandas DataFrame representation of the table.
-        
+
         name : str
             Name of the table.
+
+        encoded_columns : list, default=None, Optional
+            Names of the dictionary encoded columns.  These are kept as
+            Pandas Categorical columns in the DataFrame representation.
+
+        dtypes : dict, default=None, Optional
+            The recorded Pandas dtype of each column.
+
+        formats : dict, default=None, Optional
+            The recorded text format of each datetime column.
         """
-        self.df = df
         self.name = name
-               
+        self.encoded_columns = list(encoded_columns or [])
+        self.dtypes = dict(dtypes or {})
+        self.dtypes.update({column: 'category' for column in self.encoded_columns})
+        self.formats = dict(formats or {})
+        self.stats = None  # (cache key, column statistics) computed by Database.info
+        self.text_index_columns = []  # columns of the full-text index, see Database.create_text_index
+        self.stale = False  # True if rows were changed outside of the Database methods
+        self.reset(df)
+
     def get_shape(self):
         """
         Returns
@@ -20,3 +41,89 @@ class Table:
             The shape of the Table (DataFrame)
         """
         return self.df.shape
+
+    def reset(self, df):
+        """
+        Replaces the DataFrame representation of the table and rebuilds
+        the sketches from it.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            All rows of the table.
+
+        Returns
+        -------
+        None
+        """
+        self.df = self.conform(df)
+        self.reservoir = Reservoir()
+        self.distinct_sketches = dict()  # column name -> HyperLogLog
+        self.quantile_sketches = dict()  # column name -> TDigest
+        self.update_sketches(self.df)
+
+    def append(self, df):
+        """
+        Appends rows to the DataFrame representation of the table and
+        updates the sketches.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            The rows added to the table.
+
+        Returns
+        -------
+        None
+        """
+        self.df = self.conform(pd.concat([self.df, self.conform(df)], ignore_index = True))
+        self.update_sketches(df)
+
+    def conform(self, df):
+        """
+        Casts the columns of a DataFrame to the recorded dtypes of the table,
+        leaving columns that cannot be cast unchanged.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            Rows of the table.
+
+        Returns
+        -------
+        Pandas DataFrame
+        """
+        df = df.copy()
+        for column, dtype in self.dtypes.items():
+            if column not in df.columns or str(df[column].dtype) == dtype:
+                continue
+            try:
+                if dtype.startswith('datetime64'):
+                    df[column] = pd.to_datetime(df[column], format='ISO8601').astype(dtype)
+                elif df[column].isna().any() and dtype in ('int64', 'int32', 'bool'):
+                    df[column] = df[column].astype('Int64' if dtype.startswith('int') else 'boolean')
+                else:
+                    df[column] = df[column].astype(dtype)
+            except (ValueError, TypeError):
+                pass
+        return df
+
+    def update_sketches(self, df):
+        """
+        Updates the reservoir sample and the per-column sketches with new rows.
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            The rows added to the table.
+
+        Returns
+        -------
+        None
+        """
+        self.reservoir.update(df)
+        for column in df.columns:
+            values = df[column]
+            self.distinct_sketches.setdefault(column, HyperLogLog()).update(values)
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                self.quantile_sketches.setdefault(column, TDigest()).update(values)
@@ -12,9 +12,16 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/atc2146/pysqlgui",
     packages=setuptools.find_packages(),
+    entry_points={
+        'console_scripts': ['pysqlgui=pysqlgui.__main__:main'],
+    },
     install_requires=[
           'pandas',
+          'numpy',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
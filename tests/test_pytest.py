@@ -1,7 +1,13 @@
+import os
 import pytest
+import stat
+import time
 
 from pysqlgui import core_database
 from pysqlgui.core_table import Table
+from pysqlgui import core_server
+from pysqlgui.core_server import Client, DatabaseServer
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
@@ -302,3 +308,528 @@ def test_show_table_name_not_a_string():
 	db = core_database.Database([pd.DataFrame([['tom', 10], ['bob', 15], ['juli', 14]], columns=['name', 'age'])],['example_table'])
 	with pytest.raises(ValueError):
 		db.show(['not_a_string'])
+
+def test_sample_with_n():
+	db = core_database.Database([pd.DataFrame({'x': range(100)})], ['numbers'])
+	df = db.sample('numbers', n=10, seed=1)
+	assert df.shape == (10, 1)
+	assert df['x'].is_unique
+	assert df.equals(db.sample('numbers', n=10, seed=1))
+
+def test_sample_with_fraction():
+	db = core_database.Database([pd.DataFrame({'x': range(100)})], ['numbers'])
+	assert db.sample('numbers', fraction=0.25).shape[0] == 25
+
+def test_sample_includes_inserted_rows():
+	db = core_database.Database([pd.DataFrame({'name': ['John', 'Mary'], 'age': [32, 18]})], ['USERS'])
+	db.insert_data('USERS', {'name': 'Bob', 'age': 22})
+	assert set(db.sample('USERS', fraction=1)['name']) == {'John', 'Mary', 'Bob'}
+
+def test_sample_keeps_dtypes():
+	df = pd.DataFrame({'n': pd.array([1, None, 3], dtype='Int64'),
+					   'd': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03'])})
+	db = core_database.Database([df], ['example_table'])
+	sample = db.sample('example_table', fraction=1, seed=1)
+	assert str(sample['n'].dtype) == 'Int64'
+	assert pd.api.types.is_datetime64_any_dtype(sample['d'])
+
+def test_sketches_are_rebuilt_after_run_query_changes():
+	db = core_database.Database([pd.DataFrame({'x': range(100)})], ['numbers'])
+	db.run_query('DELETE FROM numbers WHERE x >= 10;')
+	assert db.sample('numbers', fraction=1).shape[0] == 10
+	assert set(db.sample('numbers', fraction=1)['x']) == set(range(10))
+	assert abs(db.approx_distinct('numbers', 'x')[0] - 10) <= 1
+	assert db.approx_quantile('numbers', 'x', 1)[0] == 9
+	assert db.summary()['Rows'][0] == 10
+	db.insert_data('numbers', {'x': 50})
+	assert db.summary()['Rows'][0] == 11
+
+def test_sample_wrong_arguments():
+	db = core_database.Database([pd.DataFrame({'x': range(100)})], ['numbers'])
+	with pytest.raises(ValueError):
+		db.sample('numbers')
+	with pytest.raises(ValueError):
+		db.sample('numbers', fraction=0.5, n=10)
+
+def test_approx_distinct():
+	db = core_database.Database([pd.DataFrame({'x': [i % 1000 for i in range(5000)]})], ['numbers'])
+	estimate, error = db.approx_distinct('numbers', 'x')
+	assert abs(estimate - 1000) <= 3 * error + 1
+	with pytest.raises(ValueError):
+		db.approx_distinct('numbers', 'not_a_column')
+
+def test_approx_quantile():
+	db = core_database.Database([pd.DataFrame({'x': range(10001)})], ['numbers'])
+	db.insert_data('numbers', pd.DataFrame({'x': [10001, 10002]}))
+	estimate, error = db.approx_quantile('numbers', 'x', 0.5)
+	assert abs(estimate - 5001) <= max(error, 50)
+	assert db.approx_quantile('numbers', 'x', 1)[0] == 10002
+
+def test_approx_aggregates_in_sql():
+	db = core_database.Database([pd.DataFrame({'x': [i % 50 for i in range(1000)]})], ['numbers'])
+	df = db.select('SELECT approx_count_distinct(x) AS d, approx_quantile(x, 0.5) AS m FROM numbers')
+	assert abs(df['d'][0] - 50) <= 2
+	assert abs(df['m'][0] - 24.5) < 2
+
+def test_add_table_dictionary_encode():
+	df = pd.DataFrame({'state': ['CA', 'TX', 'CA', 'CA', None, 'TX'], 'score': [1, 2, 3, 4, 5, 6]})
+	db = core_database.Database()
+	db.add_table([df], ['scores'], dictionary_encode=True)
+	assert db.get_table('scores').encoded_columns == ['state']
+	shown = db.show('scores')
+	assert isinstance(shown['state'].dtype, pd.CategoricalDtype)
+	assert list(shown['state'].isna()) == [False, False, False, False, True, False]
+	assert list(shown['state'].dropna()) == ['CA', 'TX', 'CA', 'CA', 'TX']
+	assert db.select("SELECT COUNT(*) AS n FROM scores WHERE state = 'CA'")['n'][0] == 3
+	assert isinstance(db.select('SELECT state FROM scores GROUP BY state').dtypes['state'], pd.CategoricalDtype)
+
+def test_add_table_dictionary_encode_selected_columns():
+	df = pd.DataFrame({'name': ['tom', 'bob', 'juli'], 'age': [10, 15, 14]})
+	db = core_database.Database()
+	db.add_table([df], ['example_table'], dictionary_encode=['name'])
+	assert db.get_table('example_table').encoded_columns == ['name']
+	with pytest.raises(ValueError):
+		db.add_table([df], ['other_table'], dictionary_encode=['not_a_column'])
+
+def test_insert_data_dictionary_encoded_table():
+	df = pd.DataFrame({'state': ['CA', 'TX', 'CA'], 'score': [1, 2, 3]})
+	db = core_database.Database()
+	db.add_table([df], ['scores'], dictionary_encode=['state'])
+	db.insert_data('scores', pd.DataFrame({'state': ['NY', 'CA'], 'score': [4, 5]}))
+	shown = db.show('scores')
+	assert list(shown['state']) == ['CA', 'TX', 'CA', 'NY', 'CA']
+	assert isinstance(db.get_table('scores').df['state'].dtype, pd.CategoricalDtype)
+
+def test_delete_and_update_dictionary_encoded_table():
+	df = pd.DataFrame({'state': ['CA', 'TX', 'CA', None], 'score': [1, 2, 1, 4]})
+	db = core_database.Database()
+	db.add_table([df], ['scores'], dictionary_encode=['state'])
+	db.run_query("UPDATE scores SET state = 'NY' WHERE score = 2;")
+	db.run_query("UPDATE scores SET score = 5 WHERE state IS NULL;")
+	assert db.show('scores')['state'].tolist()[:3] == ['CA', 'NY', 'CA']
+	assert db.show('scores')['score'].tolist() == [1, 2, 1, 5]
+	db.run_query("DELETE FROM scores WHERE state = 'CA';")
+	assert db.show('scores')['score'].tolist() == [2, 5]
+	assert db.select('SELECT COUNT(*) AS n FROM "scores__codes"')['n'][0] == 2
+
+def test_dictionary_encoded_table_is_indexed():
+	df = pd.DataFrame({'state': ['CA', 'TX', 'CA'], 'gender': ['F', 'M', 'F'], 'score': [1, 2, 3]})
+	db = core_database.Database()
+	db.add_table([df], ['scores'], dictionary_encode=['state', 'gender'])
+	for column in ('state', 'gender'):
+		plan = db.select(f"EXPLAIN QUERY PLAN SELECT * FROM scores WHERE {column} = 'CA'")['detail']
+		assert plan.str.contains('SEARCH c USING').any()
+	db.rename_table('scores', 'new_scores')
+	db.add_table([df], ['scores'], dictionary_encode=['state', 'gender'])
+	db.run_query("DELETE FROM new_scores WHERE state = 'CA';")
+	assert db.show('new_scores')['score'].tolist() == [2]
+	assert db.show('scores')['score'].tolist() == [1, 2, 3]
+
+def test_add_table_keeps_float_columns_without_nulls():
+	df = pd.DataFrame({'price': [1.0, 2.0, 3.0], 'user_id': [1.0, None, 3.0]})
+	db = core_database.Database()
+	db.add_table([df], ['prices'], strict=True)
+	assert db.show('prices')['price'].dtype == 'float64'
+	assert str(db.show('prices')['user_id'].dtype) == 'Int64'
+	db.insert_data('prices', pd.DataFrame({'price': [2.5], 'user_id': [4]}))
+	assert db.show('prices')['price'].tolist() == [1.0, 2.0, 3.0, 2.5]
+
+def test_select_categorizes_only_encoded_table_columns():
+	db = core_database.Database()
+	db.add_table([pd.DataFrame({'state': ['CA', 'TX']})], ['scores'], dictionary_encode=['state'])
+	db.add_table([pd.DataFrame({'state': ['CA', 'NY']})], ['offices'])
+	assert isinstance(db.select('SELECT state FROM scores')['state'].dtype, pd.CategoricalDtype)
+	assert not isinstance(db.select('SELECT state FROM offices')['state'].dtype, pd.CategoricalDtype)
+	assert list(db.select('SELECT state FROM offices')['state']) == ['CA', 'NY']
+
+def test_rename_and_drop_dictionary_encoded_table():
+	df = pd.DataFrame({'state': ['CA', 'TX', 'CA'], 'score': [1, 2, 3]})
+	db = core_database.Database()
+	db.add_table([df], ['scores'], dictionary_encode=['state'])
+	db.rename_table('scores', 'new_scores')
+	assert list(db.show('new_scores')['state']) == ['CA', 'TX', 'CA']
+	db.drop_table('new_scores')
+	assert db.select("SELECT name FROM sqlite_master WHERE name LIKE '%scores%'").empty
+
+def test_add_table_restores_dtypes():
+	df = pd.DataFrame({'user_id': [1.0, None, 3.0],
+					   'joined': ['2020-01-01', '2020-02-01', None],
+					   'active': [True, False, True],
+					   'score': [1.5, 2.5, None]})
+	db = core_database.Database([df], ['users'])
+	shown = db.show('users')
+	assert str(shown['user_id'].dtype) == 'Int64'
+	assert pd.api.types.is_datetime64_any_dtype(shown['joined'])
+	assert shown['active'].dtype == bool
+	assert shown['score'].dtype == float
+	assert pd.api.types.is_datetime64_any_dtype(db.select('SELECT joined FROM users')['joined'])
+	assert db.select('SELECT AVG(user_id) AS user_id FROM users')['user_id'][0] == 2.0
+
+def test_add_table_strict():
+	db = core_database.Database()
+	db.add_table([pd.DataFrame({'name': ['tom', 'bob'], 'age': [10, 15]})], ['example_table'], strict=True)
+	assert list(db.info('example_table')['Type']) == ['TEXT', 'INTEGER']
+	with pytest.raises(ValueError):
+		db.run_query("INSERT INTO example_table VALUES ('juli', 'not a number');")
+
+def test_insert_data_conforms_to_dtypes():
+	db = core_database.Database([pd.DataFrame({'name': ['tom'], 'joined': pd.to_datetime(['2020-01-01'])})], ['users'])
+	db.insert_data('users', {'name': 'bob', 'joined': '2021-06-01'})
+	assert pd.api.types.is_datetime64_any_dtype(db.get_table('users').df['joined'])
+	assert db.show('users')['joined'][1] == pd.Timestamp('2021-06-01')
+
+def test_follow_ingests_only_new_rows(tmp_path):
+	path = tmp_path / 'log.csv'
+	path.write_text('id,msg\n1,a\n2,b\n3,c')
+	db = core_database.Database()
+	assert db.follow(str(path), 'log') == 2
+	with open(path, 'a') as f:
+		f.write('\n4,d\n')
+	assert db.follow(str(path), 'log') == 2
+	assert db.follow(str(path), 'log') == 0
+	assert list(db.show('log')['id']) == [1, 2, 3, 4]
+
+def test_follow_resumes_after_restart(tmp_path):
+	path = tmp_path / 'log.csv'
+	path.write_text('id,msg\n1,a\n2,b\n')
+	db = core_database.Database(database=str(tmp_path / 'test.db'))
+	db.follow(str(path), 'log')
+	db.close()
+	with open(path, 'a') as f:
+		f.write('3,c\n')
+	db = core_database.Database(database=str(tmp_path / 'test.db'))
+	assert db.get_table('log').get_shape() == (2, 2)
+	assert db.follow(str(path), 'log') == 1
+	assert list(db.show('log')['id']) == [1, 2, 3]
+
+def test_concurrent_follow_ingests_rows_once(tmp_path):
+	path = tmp_path / 'log.csv'
+	path.write_text('id,msg\n' + ''.join(f'{i},m{i}\n' for i in range(20000)))
+	db = core_database.Database()
+	with ThreadPoolExecutor(max_workers=3) as executor:
+		counts = list(executor.map(lambda _: db.follow(str(path), 'log', batch_size=1000), range(3)))
+	assert sum(counts) == 20000
+	assert db.select('SELECT COUNT(*) AS n, COUNT(DISTINCT id) AS d FROM log').values.tolist() == [[20000, 20000]]
+
+def test_follow_in_background(tmp_path):
+	path = tmp_path / 'log.csv'
+	path.write_text('id,msg\n1,a\n')
+	db = core_database.Database()
+	follower = db.follow(str(path), 'log', interval=0.05)
+	with open(path, 'a') as f:
+		f.write('2,b\n')
+	for _ in range(100):
+		if follower.rows == 2:
+			break
+		time.sleep(0.05)
+	follower.stop()
+	assert follower.error is None
+	assert db.show('log').shape[0] == 2
+
+def test_follow_missing_file():
+	db = core_database.Database()
+	with pytest.raises(ValueError):
+		db.follow('file_that_does_not_exist.csv', 'log')
+
+def test_export_table_to_csv(tmp_path):
+	df = pd.DataFrame({'name': ['tom', 'bob', 'juli'], 'age': [10, 15, None]})
+	db = core_database.Database([df], ['example_table'])
+	path = tmp_path / 'out.csv'
+	assert db.export('example_table', str(path), batch_size=2) == 3
+	exported = pd.read_csv(path)
+	assert list(exported['name']) == ['tom', 'bob', 'juli']
+	assert exported['age'].isna().sum() == 1
+
+def test_export_query_to_compressed_jsonl(tmp_path):
+	df = pd.DataFrame({'name': ['tom', 'bob', 'juli'], 'age': [10, 15, 14]})
+	db = core_database.Database([df], ['example_table'])
+	path = tmp_path / 'out.jsonl.gz'
+	assert db.export('SELECT name FROM example_table WHERE age > 12', str(path), format='jsonl') == 2
+	exported = pd.read_json(path, lines=True, compression='gzip')
+	assert list(exported['name']) == ['bob', 'juli']
+
+def test_export_wrong_arguments(tmp_path):
+	db = core_database.Database([pd.DataFrame({'x': [1]})], ['example_table'])
+	with pytest.raises(ValueError):
+		db.export('example_table', str(tmp_path / 'out.parquet'), format='parquet')
+	with pytest.raises(ValueError):
+		db.export('SELECT * FROMMMMM example_table', str(tmp_path / 'out.csv'))
+	with pytest.raises(ValueError):
+		db.export('example_table', str(tmp_path / 'out.csv'), compression='zip')
+
+def test_export_rejects_statements_not_returning_rows(tmp_path):
+	db = core_database.Database([pd.DataFrame({'x': [1, 2]})], ['T2'])
+	for query in ('DELETE FROM T2', 'DROP TABLE T2', 'DELETE FROM T2 RETURNING x'):
+		path = tmp_path / 'out.csv'
+		try:
+			db.export(query, str(path))
+		except ValueError:
+			assert not path.exists()
+		assert not db.connection.in_transaction
+		assert db.select('SELECT COUNT(*) AS n FROM T2')['n'][0] == 2
+	assert db.export('t2', str(tmp_path / 'lower.csv')) == 2
+
+def test_info_with_stats():
+	df = pd.DataFrame({'name': ['tom', 'bob', 'tom', None], 'age': [10, 15, 14, 10]})
+	db = core_database.Database([df], ['example_table'])
+	info = db.info('example_table', stats=True).set_index('Column Name')
+	assert info.loc['name', 'NULLs'] == 1
+	assert info.loc['name', 'Distinct (approx.)'] == 2
+	assert info.loc['name', 'Top Values'][0] == ('tom', 2)
+	assert info.loc['age', 'Min'] == 10
+	assert info.loc['age', 'Max'] == 15
+	assert not db.select("SELECT * FROM sqlite_stat1 WHERE tbl = 'example_table'").empty
+
+def test_info_with_stats_is_cached_until_data_changes():
+	db = core_database.Database([pd.DataFrame({'age': [10, 15]})], ['example_table'])
+	first = db.info('example_table', stats=True)
+	cached = db.get_table('example_table').stats[1]
+	db.info('example_table', stats=True)
+	assert db.get_table('example_table').stats[1] is cached
+	db.insert_data('example_table', {'age': 20})
+	assert db.info('example_table', stats=True)['Max'][0] == 20
+	assert first['Max'][0] == 15
+
+def test_server_and_client_over_tcp():
+	db = core_database.Database([pd.DataFrame({'name': ['tom', 'bob', 'juli'], 'age': [10, 15, None]})], ['example_table'])
+	server = DatabaseServer(db, ('127.0.0.1', 0), workers=2, batch_size=2)
+	server.start()
+	try:
+		client = Client(server.address)
+		df = client.select('SELECT * FROM example_table')
+		assert df.shape == (3, 2)
+		assert str(df['age'].dtype) == 'Int64'
+		assert client.show('example_table').equals(db.show('example_table'))
+		assert isinstance(client.approx_distinct('example_table', 'name'), tuple)
+		client.insert_data('example_table', pd.DataFrame({'name': ['ann'], 'age': [20]}))
+		assert db.show('example_table').shape[0] == 4
+		with pytest.raises(ValueError):
+			client.select('SELECT * FROMMMMM example_table')
+		with pytest.raises(AttributeError):
+			client.close
+	finally:
+		server.shutdown()
+
+def test_server_concurrent_clients_over_unix_socket(tmp_path):
+	db = core_database.Database([pd.DataFrame({'x': range(1000)})], ['numbers'])
+	server = DatabaseServer(db, str(tmp_path / 'pysqlgui.sock'), workers=4)
+	server.start()
+	try:
+		client = Client(str(tmp_path / 'pysqlgui.sock'))
+		with ThreadPoolExecutor(max_workers=8) as pool:
+			results = list(pool.map(lambda i: client.select(f'SELECT COUNT(*) AS n FROM numbers WHERE x >= {i}')['n'][0], range(16)))
+		assert results == [1000 - i for i in range(16)]
+	finally:
+		server.shutdown()
+
+def test_server_refuses_paths_and_wrong_tokens(tmp_path):
+	(tmp_path / 'secret.csv').write_text('x\n1\n')
+	db = core_database.Database()
+	address = str(tmp_path / 'pysqlgui.sock')
+	server = DatabaseServer(db, address, token='s3cret')
+	server.start()
+	try:
+		assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+		with pytest.raises(PermissionError):
+			Client(address).show('secret')
+		client = Client(address, token='s3cret')
+		with pytest.raises(TypeError):
+			client.add_table({'secret': str(tmp_path / 'secret.csv')})
+		with pytest.raises(TypeError):
+			client.add_table([str(tmp_path / 'secret.csv')], ['secret'])
+		client.add_table({'numbers': pd.DataFrame({'x': [1]})})
+		with pytest.raises(TypeError):
+			client.insert_data('numbers', {'x': 2})
+		assert client.show('numbers')['x'].tolist() == [1]
+	finally:
+		server.shutdown()
+
+def test_server_reads_in_memory_database_with_worker_connections():
+	db = core_database.Database([pd.DataFrame({'x': range(1000)})], ['numbers'])
+	server = DatabaseServer(db, ('127.0.0.1', 0), workers=4)
+	server.start()
+	try:
+		client = Client(server.address)
+		with ThreadPoolExecutor(max_workers=8) as pool:
+			results = list(pool.map(lambda i: client.select(f'SELECT COUNT(*) AS n FROM numbers WHERE x >= {i}')['n'][0], range(16)))
+		assert results == [1000 - i for i in range(16)]
+		assert 1 <= len(server._connections) <= 4
+		db.insert_data('numbers', {'x': 1000})
+		assert client.select('SELECT MAX(x) AS m FROM numbers')['m'][0] == 1000
+	finally:
+		server.shutdown()
+		path = db.path
+		db.close()
+	assert not os.path.exists(path)
+
+def test_create_text_index_and_search():
+	df = pd.DataFrame({'title': ['SQLite full text search', 'Pandas data frames', 'python sqlite tips'],
+					   'kind': ['db', 'py', 'py']})
+	db = core_database.Database([df], ['docs'])
+	db.create_text_index('docs', ['title', 'kind'])
+	assert set(db.search('docs', 'sqlite')['title']) == {'SQLite full text search', 'python sqlite tips'}
+	assert list(db.search('docs', 'kind: py', limit=1).columns) == ['title', 'kind']
+	assert len(db.search('docs', 'kind: py', limit=1)) == 1
+	assert db.search('docs', 'missing').empty
+	with pytest.raises(ValueError):
+		db.create_text_index('docs', ['not_a_column'])
+	with pytest.raises(ValueError):
+		db.search('docs', 'sqlite', limit=0)
+
+def test_text_index_is_kept_in_sync():
+	db = core_database.Database([pd.DataFrame({'title': ['hello world', 'goodbye'], 'n': [1, 2]})], ['docs'])
+	db.create_text_index('docs', 'title')
+	db.insert_data('docs', {'title': 'hello again', 'n': 3})
+	db.add_table({'docs': pd.DataFrame({'title': ['hello there'], 'n': [4]})})
+	assert sorted(db.search('docs', 'hello')['n']) == [1, 3, 4]
+	db.run_query('DELETE FROM docs WHERE n = 1;')
+	db.run_query("UPDATE docs SET title = 'goodbye hello' WHERE n = 2;")
+	assert sorted(db.search('docs', 'hello')['n']) == [2, 3, 4]
+	db.run_query('VACUUM;')
+	assert sorted(db.search('docs', 'hello')['n']) == [2, 3, 4]
+	db.run_query('DELETE FROM docs WHERE n = 3;')
+	assert sorted(db.search('docs', 'hello')['n']) == [2, 4]
+	db.rename_table('docs', 'notes')
+	assert sorted(db.search('notes', 'hello')['n']) == [2, 4]
+	db.drop_table('notes')
+	assert db.select("SELECT * FROM sqlite_master WHERE name LIKE 'notes%'").empty
+
+def test_text_index_on_dictionary_encoded_table(tmp_path):
+	path = str(tmp_path / 'search.db')
+	db = core_database.Database(database=path)
+	db.add_table({'docs': pd.DataFrame({'title': ['red apple', 'green pear', 'red cherry'],
+										'color': ['red', 'green', 'red']})}, dictionary_encode=['color'])
+	db.create_text_index('docs', ['title', 'color'])
+	db.insert_data('docs', {'title': 'blue berry', 'color': 'blue'})
+	result = db.search('docs', 'color: blue')
+	assert list(result['title']) == ['blue berry']
+	assert isinstance(result['color'].dtype, pd.CategoricalDtype)
+	db.close()
+
+	db = core_database.Database(database=path)
+	assert list(db.summary()['Table Name']) == ['docs']
+	assert db.get_table('docs').text_index_columns == ['title', 'color']
+	assert len(db.search('docs', 'red')) == 2
+	db.run_query("DELETE FROM docs WHERE title = 'red apple';")
+	db.run_query('VACUUM;')
+	assert list(db.search('docs', 'red')['title']) == ['red cherry']
+	db.close()
+
+def test_text_index_on_table_with_rank_column():
+	df = pd.DataFrame({'rank': [1, 2, 3], 'title': ['red apple', 'green pear', 'red cherry']})
+	db = core_database.Database([df], ['fruits'])
+	db.create_text_index('fruits', 'title')
+	db.run_query('DELETE FROM fruits WHERE rank = 1;')
+	db.run_query('vacuum;')
+	assert db.search('fruits', 'red').values.tolist() == [[3, 'red cherry']]
+
+def test_select_does_not_restore_dtypes_of_aggregates():
+	db = core_database.Database([pd.DataFrame({'name': ['a', 'b'], 'active': [True, False]}),
+								 pd.DataFrame({'age': [10, 15]})], ['users', 'people'])
+	assert db.select("SELECT SUM(active) AS active FROM users WHERE name = 'a'")['active'][0] == 1
+	assert str(db.select("SELECT SUM(active) AS active FROM users")['active'].dtype) == 'int64'
+	assert str(db.select('SELECT COUNT(*) AS active FROM users')['active'].dtype) == 'int64'
+	assert db.select("SELECT 2.5 AS age FROM users")['age'][0] == 2.5
+	assert str(db.select('SELECT active FROM users')['active'].dtype) == 'bool'
+	assert str(db.select('SELECT u.ACTIVE AS active FROM users u')['active'].dtype) == 'bool'
+	assert str(db.select('SELECT name AS active FROM users')['active'].dtype) != 'bool'
+
+def test_datetime_format_is_fixed_per_column():
+	df = pd.DataFrame({'d': pd.to_datetime(['2020-01-01 10:30:00'])})
+	db = core_database.Database([df], ['events'])
+	db.insert_data('events', {'d': pd.Timestamp('2020-01-02')})
+	db.add_table({'events': pd.DataFrame({'d': pd.to_datetime(['2020-01-02'])})})
+	assert db.select("SELECT COUNT(*) AS n FROM events WHERE d = '2020-01-02 00:00:00'")['n'][0] == 2
+	assert db.select("SELECT format FROM _pysqlgui_columns WHERE table_name = 'events'")['format'][0] == '%Y-%m-%d %H:%M:%S'
+
+def test_datetime_format_is_widened_for_longer_values(tmp_path):
+	path = str(tmp_path / 'days.db')
+	db = core_database.Database([pd.DataFrame({'d': pd.to_datetime(['2020-01-01', None])})], ['days'], database=path)
+	db.insert_data('days', {'d': pd.Timestamp('2020-01-02 10:30:00')})
+	assert db.select("SELECT d FROM days")['d'].tolist()[0] == pd.Timestamp('2020-01-01')
+	assert db.select("SELECT COUNT(*) AS n FROM days WHERE d = '2020-01-01 00:00:00'")['n'][0] == 1
+	db.add_table({'days': pd.DataFrame({'d': pd.to_datetime(['2020-01-03 08:00:00.250000'])})})
+	db.close()
+
+	db = core_database.Database(database=path)
+	assert db.get_table('days').formats == {'d': '%Y-%m-%d %H:%M:%S.%f'}
+	assert db.select("SELECT d FROM days WHERE d IS NOT NULL")['d'].tolist() == [
+		pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-02 10:30:00'), pd.Timestamp('2020-01-03 08:00:00.25')]
+	assert db.select("SELECT COUNT(*) AS n FROM days WHERE d = '2020-01-02 10:30:00.000000'")['n'][0] == 1
+
+def test_datetime_format_is_widened_on_encoded_table():
+	df = pd.DataFrame({'state': ['CA', 'CA', 'TX'], 'd': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03'])})
+	db = core_database.Database()
+	db.add_table([df], ['visits'], dictionary_encode=['state'])
+	db.insert_data('visits', {'state': 'CA', 'd': pd.Timestamp('2020-01-04 09:00:00')})
+	assert db.select("SELECT COUNT(*) AS n FROM visits WHERE d = '2020-01-01 00:00:00'")['n'][0] == 1
+	assert db.show('visits')['d'].tolist()[-1] == pd.Timestamp('2020-01-04 09:00:00')
+
+def test_reopen_database_after_run_query_drop_and_rename(tmp_path):
+	path = str(tmp_path / 'stale.db')
+	db = core_database.Database([pd.DataFrame({'x': [1, 2]}), pd.DataFrame({'y': [True, False]})],
+								['dropped', 'renamed'], database=path)
+	db.run_query('DROP TABLE dropped;')
+	db.run_query('ALTER TABLE renamed RENAME TO moved;')
+	db.close()
+
+	db = core_database.Database(database=path)
+	assert list(db.summary()['Table Name']) == ['moved']
+	assert db.select('SELECT table_name FROM _pysqlgui_columns').empty
+	assert db.show('moved')['y'].tolist() == [1, 0]
+	db.close()
+
+def test_info_with_stats_on_empty_table():
+	db = core_database.Database()
+	db.create_table('empty', {'a': 'TEXT'})
+	info = db.info('empty', stats=True).set_index('Column Name')
+	assert info.loc['a', 'NULLs'] == 0
+	assert info.loc['a', 'Distinct (approx.)'] == 0
+	assert info.loc['a', 'Top Values'] == []
+
+@pytest.mark.parametrize('formats', [['json'], core_server.FORMATS])
+def test_server_sends_mixed_type_columns(monkeypatch, formats):
+	monkeypatch.setattr(core_server, 'FORMATS', formats)
+	df = pd.DataFrame({'name': ['tom', 'bob'], 'age': pd.array([10, None], dtype='Int64'),
+					   'joined': pd.to_datetime(['2020-01-01 10:00:00', None]), 'active': [True, False]})
+	db = core_database.Database([df], ['example_table'])
+	db.run_query("INSERT INTO example_table(name, age) VALUES ('ann', 'unknown');")
+	server = DatabaseServer(db, ('127.0.0.1', 0))
+	server.start()
+	try:
+		client = Client(server.address)
+		assert client.show('example_table')['age'].tolist() == [10, None, 'unknown']
+		info = client.info('example_table', stats=True)
+		assert list(info['Column Name']) == ['name', 'age', 'joined', 'active']
+		shown = client.select('SELECT age, joined, active FROM example_table LIMIT 2')
+		assert str(shown['age'].dtype) == 'Int64'
+		assert pd.api.types.is_datetime64_any_dtype(shown['joined'])
+		assert shown['active'].tolist() == [True, False]
+	finally:
+		server.shutdown()
+
+def test_server_does_not_remove_other_files(tmp_path):
+	path = tmp_path / 'data.db'
+	path.write_text('keep me')
+	with pytest.raises(ValueError):
+		DatabaseServer(core_database.Database(), str(path))
+	assert path.read_text() == 'keep me'
+
+def test_server_reads_file_database_with_worker_connections(tmp_path):
+	db = core_database.Database([pd.DataFrame({'x': range(1000)})], ['numbers'], database=str(tmp_path / 'numbers.db'))
+	server = DatabaseServer(db, ('127.0.0.1', 0), workers=4)
+	server.start()
+	try:
+		client = Client(server.address)
+		with ThreadPoolExecutor(max_workers=8) as pool:
+			results = list(pool.map(lambda i: client.run_query(f'SELECT COUNT(*) AS n FROM numbers WHERE x >= {i}')['n'][0], range(16)))
+		assert results == [1000 - i for i in range(16)]
+		assert 1 <= len(server._connections) <= 4
+		client.insert_data('numbers', pd.DataFrame({'x': [1000]}))
+		assert client.select('SELECT MAX(x) AS m FROM numbers')['m'][0] == 1000
+		with pytest.raises(ValueError):
+			client.select('SELECT * FROMMMMM numbers')
+	finally:
+		server.shutdown()
+		db.close()
+